@@ -0,0 +1,98 @@
+import inspect
+import os
+import re
+from types import SimpleNamespace
+from typing import Dict
+
+import torch
+
+
+def backend_device(backend: str, default: torch.device) -> torch.device:
+    """Device a backend's inputs must live on."""
+    return default if backend == "torch" else torch.device("cpu")
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamically quantize a model's Linear layers to int8 weights."""
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxModel:
+    """ONNX Runtime session behind the call interface of a Hugging Face classifier.
+
+    ``model(**inputs).logits`` and ``model.config`` behave as they do for
+    the PyTorch model, so detector code is the same for every backend.
+    """
+
+    def __init__(self, path: str, config):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+
+        self.path = path
+        self.config = config
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+
+    def __call__(self, **inputs) -> SimpleNamespace:
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+def export_onnx(model: torch.nn.Module, example_inputs: Dict[str, torch.Tensor], path: str):
+    """Export a classifier to ONNX with dynamic batch (and sequence) dimensions."""
+    # Inputs go in positionally, in forward() order, with None for gaps
+    parameters = list(inspect.signature(model.forward).parameters)
+    last = max(parameters.index(name) for name in example_inputs)
+    args = tuple(example_inputs.get(name) for name in parameters[:last + 1])
+    names = [name for name in parameters[:last + 1] if name in example_inputs]
+    dynamic_axes = {name: {0: "batch"} for name in names}
+    for name, tensor in example_inputs.items():
+        if tensor.dim() == 2:
+            # Token inputs also vary in sequence length
+            dynamic_axes[name][1] = "sequence"
+    dynamic_axes["logits"] = {0: "batch"}
+
+    options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles dynamic axes without onnxscript
+        options["dynamo"] = False
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model.cpu().eval(), args, path,
+            input_names=names, output_names=["logits"], dynamic_axes=dynamic_axes,
+            opset_version=17, **options
+        )
+
+
+def onnx_path(model_id: str) -> str:
+    """Where the ONNX export of a model is cached (delete it to re-export)."""
+    cache_dir = os.getenv("MODEL_CACHE_DIR", "./models")
+    return os.path.join(cache_dir, "onnx", re.sub(r"[^A-Za-z0-9_.-]+", "--", model_id) + ".onnx")
+
+
+def load_backend(backend: str, model: torch.nn.Module, model_id: str,
+                 example_inputs: Dict[str, torch.Tensor], device: torch.device):
+    """Wrap a loaded eval-mode model in the requested backend.
+
+    ``example_inputs`` are only used for the first ONNX export; later
+    loads reuse the exported file.
+    """
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend == "onnx":
+        path = onnx_path(model_id)
+        if not os.path.exists(path):
+            export_onnx(model, example_inputs, path)
+        return OnnxModel(path, model.config)
+    return model.to(device)
@@ -0,0 +1,4 @@
+"""Offline performance benchmarks for the detection backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.video_decode``.
+"""
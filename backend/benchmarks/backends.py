@@ -0,0 +1,164 @@
+"""
+Compare the torch, int8 and onnx inference backends.
+
+Each backend is loaded in a fresh process (so memory figures do not
+overlap) and scores the same images and texts. Reports load time, resident
+memory, per-item latency and, as a parity check, how far each backend's AI
+probabilities drift from the fp32 torch baseline:
+
+    python -m benchmarks.backends
+    python -m benchmarks.backends --images samples/ --texts samples.txt --json out.json
+
+Without --images/--texts, synthetic inputs are used; drift is more
+meaningful on real samples.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def synthetic_images(count: int, size: int = 512) -> list:
+    """Smooth gradients with noise, varied per image."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size] / size
+    images = []
+    for i in range(count):
+        base = np.stack([x * (i + 1) % 1, y, (x + y) / 2], axis=-1) * 255
+        noisy = base + rng.normal(0, 12, base.shape)
+        images.append(np.clip(noisy, 0, 255).astype(np.uint8))
+    return images
+
+
+def synthetic_texts(count: int) -> list:
+    rng = np.random.default_rng(0)
+    words = ("the model results show that our approach improves accuracy while people "
+             "often write about weather travel food and their day in short casual notes").split()
+    return [" ".join(rng.choice(words, size=int(rng.integers(20, 200)))) for _ in range(count)]
+
+
+def load_images(directory: str) -> list:
+    images = []
+    for name in sorted(os.listdir(directory)):
+        try:
+            images.append(np.asarray(Image.open(os.path.join(directory, name)).convert('RGB')))
+        except Exception:
+            continue
+    return images
+
+
+def run_backend(backend: str, images: list, texts: list, repeat: int) -> dict:
+    """Load AIDetector with one backend and time it (runs in a child process)."""
+    os.environ["INFERENCE_BACKEND"] = backend
+    os.environ.pop("IMAGE_BACKEND", None)
+    os.environ.pop("TEXT_BACKEND", None)
+
+    import torch
+    from detectors import AIDetector
+
+    before = rss_mb()
+    start = time.perf_counter()
+    detector = AIDetector()
+    detector.load_models(["image", "text"])
+    load_s = time.perf_counter() - start
+    loaded = rss_mb()
+
+    def timed(fn, items):
+        fn(items[:1])  # warm-up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            predictions = fn(items)
+            timings.append(time.perf_counter() - start)
+        return predictions, statistics.median(timings) / max(len(items), 1) * 1000
+
+    image_predictions, image_ms = timed(detector.detect_images_from_arrays, images) if images else ([], 0.0)
+    text_predictions, text_ms = timed(detector.detect_texts, texts) if texts else ([], 0.0)
+
+    return {
+        "backend": backend,
+        "threads": torch.get_num_threads(),
+        "load_s": round(load_s, 2),
+        "models_rss_mb": round(loaded - before, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "image_ms_per_item": round(image_ms, 2),
+        "text_ms_per_item": round(text_ms, 2),
+        "image_ai_probs": [prediction[2] for prediction in image_predictions],
+        "text_ai_probs": [prediction[2] for prediction in text_predictions],
+        "image_results": [prediction[0] for prediction in image_predictions],
+        "text_results": [prediction[0] for prediction in text_predictions],
+    }
+
+
+def drift(baseline: dict, row: dict, modality: str) -> dict:
+    """Probability drift and verdict agreement of one backend against the baseline."""
+    reference = np.array(baseline[f"{modality}_ai_probs"])
+    probs = np.array(row[f"{modality}_ai_probs"])
+    if not len(reference):
+        return {}
+    delta = np.abs(probs - reference)
+    agree = np.mean([a == b for a, b in zip(baseline[f"{modality}_results"], row[f"{modality}_results"])])
+    return {
+        "max_abs_drift": round(float(delta.max()), 5),
+        "mean_abs_drift": round(float(delta.mean()), 5),
+        "verdict_agreement_pct": round(float(agree) * 100, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"],
+                        help="backends to compare; the first is the parity baseline")
+    parser.add_argument("--images", help="directory of sample images (default: synthetic)")
+    parser.add_argument("--texts", help="file with one sample text per line (default: synthetic)")
+    parser.add_argument("--count", type=int, default=16, help="synthetic samples per modality")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per backend, median is reported")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count)
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = synthetic_texts(args.count)
+
+    rows = []
+    for backend in args.backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            rows.append(executor.submit(run_backend, backend, images, texts, args.repeat).result())
+
+    baseline = rows[0]
+    print(f"{len(images)} images, {len(texts)} texts; drift against {baseline['backend']}")
+    print(f"  {'backend':<8}{'load s':>8}{'model MB':>10}{'peak MB':>9}{'img ms':>8}{'txt ms':>8}"
+          f"{'img drift':>11}{'txt drift':>11}{'agree %':>9}")
+    for row in rows:
+        row["parity"] = {"image": drift(baseline, row, "image"), "text": drift(baseline, row, "text")}
+        image_parity, text_parity = row["parity"]["image"], row["parity"]["text"]
+        agreement = min(p.get("verdict_agreement_pct", 100.0) for p in (image_parity, text_parity))
+        print(f"  {row['backend']:<8}{row['load_s']:>8.2f}{row['models_rss_mb']:>10.1f}{row['peak_rss_mb']:>9.1f}"
+              f"{row['image_ms_per_item']:>8.2f}{row['text_ms_per_item']:>8.2f}"
+              f"{image_parity.get('max_abs_drift', 0):>11.5f}{text_parity.get('max_abs_drift', 0):>11.5f}"
+              f"{agreement:>9.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "backends", "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Fit and evaluate the cheap-first detection cascade (CASCADE_STAGES).
+
+Scores sample images and texts with the transformer models, fits the
+linear stage to their AI probabilities (distillation) on part of the sample
+and writes it to --output, for CASCADE_MODEL_PATH. On the held-out rest it
+then reports, for a sweep of linear-stage thresholds, the share of items
+each stage decides (hit rate), how often those decisions match the model's
+verdict, and the mean compute per item against running the model alone:
+
+    python -m benchmarks.cascade --images samples/ --texts samples.txt --output cascade.json
+    python -m benchmarks.cascade --model cascade.json --images held_out/ --holdout 1
+
+Without --images/--texts, synthetic inputs are used (a quarter of the
+images carry a Stable Diffusion "parameters" chunk for the metadata
+stage); the fitted model is only meaningful on real samples.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, PngImagePlugin
+
+from benchmarks.backends import synthetic_images, synthetic_texts
+
+# (CASCADE_LINEAR_AI, CASCADE_LINEAR_HUMAN) pairs to compare
+THRESHOLDS = ((0.99, 0.01), (0.97, 0.03), (0.9, 0.1), (0.8, 0.2))
+
+
+def write_synthetic_images(directory: str, count: int) -> list:
+    paths = []
+    for i, pixels in enumerate(synthetic_images(count)):
+        info = PngImagePlugin.PngInfo()
+        if i % 4 == 0:
+            info.add_text("parameters", "a photo of a cat\nSteps: 20, Sampler: Euler a, CFG scale: 7")
+        path = os.path.join(directory, f"{i:04d}.png")
+        Image.fromarray(pixels).save(path, pnginfo=info)
+        paths.append(path)
+    return paths
+
+
+def ms_since(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(detector, content_type: str, items: list) -> list:
+    """Per item: metadata verdict, cheap features, stage latencies and the model's own score."""
+    from cascade import image_features, image_provenance, text_features
+    from preprocessing import open_image
+
+    rows = []
+    for item in items:
+        row = {"metadata": None, "metadata_ms": 0.0, "decode_ms": 0.0}
+        if content_type == "image":
+            start = time.perf_counter()
+            row["metadata"] = image_provenance(item)
+            row["metadata_ms"] = ms_since(start)
+            # Decoded once, as in the cascade: for the linear stage's features and the model
+            start = time.perf_counter()
+            item = open_image(item, detector.image_decode_size)
+            row["decode_ms"] = ms_since(start)
+
+        start = time.perf_counter()
+        row["features"] = image_features(item) if content_type == "image" else text_features(item)
+        row["linear_ms"] = ms_since(start)
+
+        start = time.perf_counter()
+        if content_type == "image":
+            prediction, _ = detector.detect_images_indexed([item])[0]
+        else:
+            prediction, _ = detector.detect_text_windows(item)
+        row["model_ms"] = ms_since(start)
+        row["model_ai_prob"] = prediction[2]
+        rows.append(row)
+    return rows
+
+
+def simulate(detector, model, rows: list, ai_threshold: float, human_threshold: float) -> dict:
+    """Hit rates, verdict agreement and mean cost of the cascade on measured items."""
+    decided = {"metadata": 0, "linear": 0, "model": 0}
+    agree = {"metadata": 0, "linear": 0}
+    total_ms = 0.0
+    for row in rows:
+        model_verdict = detector._classify(row["model_ai_prob"])
+        total_ms += row["metadata_ms"]
+        if row["metadata"]:
+            decided["metadata"] += 1
+            agree["metadata"] += model_verdict == detector._classify(1.0)
+            continue
+        total_ms += row["decode_ms"]
+        if model is not None:
+            total_ms += row["linear_ms"]
+            ai_prob = model.predict(row["features"])
+            if ai_prob >= ai_threshold or ai_prob <= human_threshold:
+                decided["linear"] += 1
+                agree["linear"] += model_verdict == detector._classify(ai_prob)
+                continue
+        decided["model"] += 1
+        total_ms += row["model_ms"]
+
+    count = max(len(rows), 1)
+    return {
+        "thresholds": [ai_threshold, human_threshold],
+        "hit_rate": {stage: round(n / count, 3) for stage, n in decided.items()},
+        "agreement": {stage: round(agree[stage] / decided[stage], 3) if decided[stage] else None for stage in agree},
+        "cascade_ms_per_item": round(total_ms / count, 2),
+        "model_ms_per_item": round(sum(row["decode_ms"] + row["model_ms"] for row in rows) / count, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of sample images (default: synthetic)")
+    parser.add_argument("--texts", help="file with one sample text per line (default: synthetic)")
+    parser.add_argument("--count", type=int, default=64, help="synthetic samples per modality")
+    parser.add_argument("--holdout", type=float, default=0.3, help="share of samples kept out of fitting")
+    parser.add_argument("--model", help="evaluate this linear model file instead of fitting one")
+    parser.add_argument("--output", help="write the fitted linear models here (CASCADE_MODEL_PATH)")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    os.environ.pop("CASCADE_STAGES", None)
+    from cascade import IMAGE_FEATURES, TEXT_FEATURES, LinearModel, load_linear_models, save_linear_models
+    from detectors import AIDetector
+
+    detector = AIDetector()
+    detector.load_models(["image", "text"])
+    loaded = load_linear_models(args.model) if args.model else {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.images:
+            images = [os.path.join(args.images, name) for name in sorted(os.listdir(args.images))]
+            images = [path for path in images if os.path.isfile(path)]
+        else:
+            images = write_synthetic_images(directory, args.count)
+        if args.texts:
+            with open(args.texts) as f:
+                texts = [line.strip() for line in f if line.strip()]
+        else:
+            texts = synthetic_texts(args.count)
+        measured = {"image": measure(detector, "image", images), "text": measure(detector, "text", texts)}
+
+    models, results = {}, {}
+    rng = np.random.default_rng(0)
+    for modality, features in (("image", IMAGE_FEATURES), ("text", TEXT_FEATURES)):
+        rows = measured[modality]
+        order = rng.permutation(len(rows))
+        n_held_out = len(rows) if args.model else int(round(len(rows) * args.holdout))
+        held_out = [rows[i] for i in order[:n_held_out]]
+        train = [rows[i] for i in order[n_held_out:]]
+
+        if args.model:
+            models[modality] = loaded.get(modality)
+        elif train:
+            models[modality] = LinearModel.fit(
+                features, np.stack([row["features"] for row in train]), np.array([row["model_ai_prob"] for row in train])
+            )
+        evaluated = held_out or train
+        results[modality] = [simulate(detector, models.get(modality), evaluated, *pair) for pair in THRESHOLDS]
+
+        print(f"{modality}: {len(rows)} samples, {len(train)} fitted, {len(evaluated)} evaluated")
+        print(f"  {'ai/human':<11}{'metadata':>9}{'linear':>8}{'model':>7}{'agree meta':>12}{'agree lin':>11}"
+              f"{'cascade ms':>12}{'model ms':>10}")
+        for row in results[modality]:
+            agreement = row["agreement"]
+            print(f"  {row['thresholds'][0]:.2f}/{row['thresholds'][1]:.2f}  "
+                  f"{row['hit_rate']['metadata']:>8.3f}{row['hit_rate']['linear']:>8.3f}{row['hit_rate']['model']:>7.3f}"
+                  f"{agreement['metadata'] if agreement['metadata'] is not None else '-':>12}"
+                  f"{agreement['linear'] if agreement['linear'] is not None else '-':>11}"
+                  f"{row['cascade_ms_per_item']:>12.2f}{row['model_ms_per_item']:>10.2f}")
+
+    if args.output:
+        save_linear_models(args.output, {modality: model for modality, model in models.items() if model is not None})
+        print(f"Linear models written to {args.output}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "cascade", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
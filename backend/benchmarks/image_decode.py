@@ -0,0 +1,146 @@
+"""
+Compare full-resolution and reduced image decoding (IMAGE_REDUCED_DECODE).
+
+Writes synthetic JPEG and PNG images at a few sizes, then decodes each one
+in a fresh process per mode (so peak memory figures do not overlap): fully
+to RGB, as before, and through open_image at the image model's input size.
+Reports decode time, the process's peak resident memory growth and, as a
+parity check, how far the model's pixel_values drift from the full decode,
+in 0-255 pixel levels:
+
+    python -m benchmarks.image_decode
+    python -m benchmarks.image_decode --megapixels 12 24 50 --formats JPEG --json out.json
+
+Uses IMAGE_MODEL_ID's processor config for the target size.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.backends import rss_mb, synthetic_images
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+def write_image(directory: str, megapixels: float, image_format: str) -> str:
+    """A 4:3 synthetic image of about ``megapixels``, with fine noise so it does not compress to nothing."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    image = Image.fromarray(synthetic_images(1)[0]).resize((width, height), Image.BILINEAR)
+    noise = np.random.default_rng(2).integers(-8, 9, (height, width, 1), dtype=np.int16)
+    pixels = np.clip(np.asarray(image, dtype=np.int16) + noise, 0, 255).astype(np.uint8)
+    path = os.path.join(directory, f"{megapixels:g}mp{EXTENSIONS[image_format]}")
+    Image.fromarray(pixels).save(path, image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return path
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process since the last reset_peak_rss."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Restart peak tracking at the current footprint (Linux); imports made before stay out of the figure."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def decode(path: str, min_size, repeat: int) -> dict:
+    """Decode one file ``repeat`` times (runs in a child process)."""
+    from preprocessing import open_image
+
+    before = rss_mb()
+    reset_peak_rss()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = open_image(path, min_size)
+        timings.append(time.perf_counter() - start)
+        del image
+    return {
+        "decode_ms": round(statistics.median(timings) * 1000, 2),
+        # Growth over the process's footprint before decoding
+        "peak_rss_mb": round(peak_rss_mb() - before, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", nargs="+", type=float, default=[2, 12, 24, 50], help="image sizes")
+    parser.add_argument("--formats", nargs="+", default=["JPEG", "PNG"], choices=sorted(EXTENSIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="decodes per image and mode, median is reported")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    from transformers import AutoImageProcessor
+
+    from config import IMAGE_MODEL_ID
+    from preprocessing import TensorPreprocessor, decode_size, open_image
+
+    processor = AutoImageProcessor.from_pretrained(IMAGE_MODEL_ID)
+    min_size = decode_size(processor)
+    if min_size is None:
+        raise SystemExit(f"{type(processor).__name__} keeps full-size images; nothing to reduce")
+    tensor = TensorPreprocessor.from_processor(processor)
+    levels = tensor.weight.view(-1, 1, 1).abs() if tensor is not None else None
+
+    def pixel_values(image):
+        if tensor is not None:
+            return tensor([image])["pixel_values"]
+        return processor(image, return_tensors="pt")["pixel_values"]
+
+    print(f"{IMAGE_MODEL_ID}: decoding to at least {min_size[0]}x{min_size[1]}")
+    print(f"  {'image':<10}{'full ms':>9}{'reduced ms':>12}{'full MB':>9}{'reduced MB':>12}"
+          f"{'decoded':>12}{'max lvl':>9}{'mean lvl':>10}")
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for image_format in args.formats:
+            for megapixels in args.megapixels:
+                path = write_image(directory, megapixels, image_format)
+                results = {}
+                for mode, size in (("full", None), ("reduced", min_size)):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                        results[mode] = executor.submit(decode, path, size, args.repeat).result()
+
+                full, reduced = open_image(path), open_image(path, min_size)
+                diff = (pixel_values(full) - pixel_values(reduced)).abs()
+                if levels is not None:
+                    diff = diff / levels
+                row = {
+                    "image": f"{megapixels:g}MP {image_format}",
+                    "full_size": list(full.size),
+                    "reduced_size": list(reduced.size),
+                    "full": results["full"],
+                    "reduced": results["reduced"],
+                    "max_levels": round(float(diff.max()), 2),
+                    "mean_levels": round(float(diff.mean()), 4),
+                }
+                rows.append(row)
+                print(f"  {row['image']:<10}{results['full']['decode_ms']:>9.1f}{results['reduced']['decode_ms']:>12.1f}"
+                      f"{results['full']['peak_rss_mb']:>9.1f}{results['reduced']['peak_rss_mb']:>12.1f}"
+                      f"{'x'.join(map(str, reduced.size)):>12}{row['max_levels']:>9.2f}{row['mean_levels']:>10.4f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "image_decode", "model": IMAGE_MODEL_ID, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
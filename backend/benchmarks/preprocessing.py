@@ -0,0 +1,104 @@
+"""
+Check tensor preprocessing against the Hugging Face image processor.
+
+Runs the same uint8 RGB frames through the image model's processor (one
+PIL image at a time) and through TensorPreprocessor (IMAGE_PREPROCESS=tensor,
+batched), then reports how far the pixel values differ, in normalized units
+and in 0-255 pixel levels, and how long each takes per frame:
+
+    python -m benchmarks.preprocessing
+    python -m benchmarks.preprocessing --sizes 720x1280 1080x1920 --batch 32 --json out.json
+
+Uses IMAGE_MODEL_ID's processor config (resize, resampling, mean and std).
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from benchmarks.backends import synthetic_images
+
+
+def frames(height: int, width: int, count: int) -> list:
+    """Synthetic frames at one resolution: smooth gradients, then pure noise for resampling extremes."""
+    smooth = [np.asarray(Image.fromarray(image).resize((width, height)))
+              for image in synthetic_images(count // 2 or 1)]
+    rng = np.random.default_rng(1)
+    noise = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count - len(smooth))]
+    return smooth + noise
+
+
+def per_frame_ms(fn, count: int, repeat: int) -> float:
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["224x224", "360x640", "720x1280"],
+                        help="frame resolutions as HEIGHTxWIDTH")
+    parser.add_argument("--batch", type=int, default=16, help="frames per batch (as in VIDEO_BATCH_SIZE)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path, median is reported")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    from transformers import AutoImageProcessor
+
+    from config import IMAGE_MODEL_ID
+    from preprocessing import TensorPreprocessor
+
+    processor = AutoImageProcessor.from_pretrained(IMAGE_MODEL_ID)
+    tensor = TensorPreprocessor.from_processor(processor)
+    if tensor is None:
+        raise SystemExit(f"{type(processor).__name__} is not supported by tensor preprocessing")
+    # Normalized units back to pixel levels: divide by scale / std per channel
+    levels = tensor.weight.view(-1, 1, 1).abs()
+
+    print(f"{IMAGE_MODEL_ID}: {type(processor).__name__}, {tensor.mode} resize, {torch.get_num_threads()} threads")
+    print(f"  {'size':<11}{'max diff':>10}{'mean diff':>11}{'max lvl':>9}{'mean lvl':>10}"
+          f"{'proc ms':>9}{'tensor ms':>11}{'speedup':>9}")
+    rows = []
+    for size in args.sizes:
+        height, width = (int(part) for part in size.split("x"))
+        batch = frames(height, width, args.batch)
+
+        def run_processor():
+            return processor([Image.fromarray(frame) for frame in batch], return_tensors="pt")["pixel_values"]
+
+        def run_tensor():
+            return tensor(batch)["pixel_values"]
+
+        diff = (run_processor() - run_tensor()).abs()
+        processor_ms = per_frame_ms(run_processor, len(batch), args.repeat)
+        tensor_ms = per_frame_ms(run_tensor, len(batch), args.repeat)
+        row = {
+            "size": size,
+            "max_abs_diff": round(float(diff.max()), 5),
+            "mean_abs_diff": round(float(diff.mean()), 6),
+            "max_levels": round(float((diff / levels).max()), 2),
+            "mean_levels": round(float((diff / levels).mean()), 4),
+            "processor_ms_per_frame": round(processor_ms, 3),
+            "tensor_ms_per_frame": round(tensor_ms, 3),
+        }
+        rows.append(row)
+        print(f"  {size:<11}{row['max_abs_diff']:>10.5f}{row['mean_abs_diff']:>11.6f}"
+              f"{row['max_levels']:>9.2f}{row['mean_levels']:>10.4f}"
+              f"{processor_ms:>9.2f}{tensor_ms:>11.2f}{processor_ms / tensor_ms:>8.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "preprocessing", "model": IMAGE_MODEL_ID, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Measure model memory across gunicorn workers with and without preloading.
+
+Starts `gunicorn -c gunicorn.conf.py main:app` with N workers twice, once
+with PRELOAD_MODELS=true (models loaded in the master and shared by the
+forked workers) and once with PRELOAD_MODELS=false (each worker loads its
+own). It waits for readiness and sends a few detections so every worker
+has run inference, then sums memory over the master and its workers:
+
+- RSS counts shared pages once per process (overstates preloading)
+- PSS splits each shared page between the processes that map it
+- USS counts only pages private to a process
+
+    python -m benchmarks.shared_memory
+    python -m benchmarks.shared_memory --workers 1 2 4 --json out.json
+
+Linux only (reads /proc/<pid>/smaps_rollup).
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS, PSS and USS of one process from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def request(url: str, data: bytes = None, timeout: float = 60) -> int:
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def measure(workers: int, preload: bool, warm_requests: int, startup_timeout: float) -> dict:
+    """Run one gunicorn configuration and sum memory over its processes."""
+    port = free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(port),
+           "PRELOAD_MODELS": "true" if preload else "false"}
+    command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+               "--pythonpath", BACKEND_DIR, "--bind", f"127.0.0.1:{port}", "main:app"]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+
+    try:
+        start = time.perf_counter()
+        # Readiness comes from whichever worker answers, so require a run of successes
+        streak = 0
+        while streak < workers * 5:
+            if time.perf_counter() - start > startup_timeout:
+                raise RuntimeError(f"gunicorn not ready after {startup_timeout}s")
+            streak = streak + 1 if request(f"{base}/ready", timeout=5) == 200 else 0
+            time.sleep(0.05 if streak else 0.5)
+        ready_s = time.perf_counter() - start
+
+        body = urllib.parse.urlencode({"text": "A short text to exercise the model."}).encode()
+        statuses = [request(f"{base}/detect", data=body) for _ in range(warm_requests * workers)]
+
+        pids = [server.pid] + children(server.pid)
+        per_process = [memory_mb(pid) for pid in pids]
+        total = {key: round(sum(m[key] for m in per_process), 1) for key in ("rss", "pss", "uss")}
+        return {"workers": workers, "preload": preload, "processes": len(pids),
+                "ready_s": round(ready_s, 2), "failed_requests": sum(status != 200 for status in statuses),
+                "total_mb": total}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="gunicorn worker counts to measure (default: 1 2 4)")
+    parser.add_argument("--warm-requests", type=int, default=4, help="detections per worker before measuring")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"  {'workers':>7}  {'mode':<10}{'ready s':>8}{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}")
+    for workers in args.workers:
+        rows = [measure(workers, preload, args.warm_requests, args.startup_timeout) for preload in (False, True)]
+        for row in rows:
+            total = row["total_mb"]
+            mode = "preload" if row["preload"] else "per-worker"
+            print(f"  {workers:>7}  {mode:<10}{row['ready_s']:>8.2f}"
+                  f"{total['rss']:>9.1f}{total['pss']:>9.1f}{total['uss']:>9.1f}"
+                  f"{'  (%d failed requests)' % row['failed_requests'] if row['failed_requests'] else ''}")
+        saved = rows[0]["total_mb"]["pss"] - rows[1]["total_mb"]["pss"]
+        print(f"  {'':>7}  preloading saves {saved:.1f} MB PSS")
+        results.append({"workers": workers, "runs": rows, "pss_saved_mb": round(saved, 1)})
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "shared_memory", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
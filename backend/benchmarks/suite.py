@@ -0,0 +1,440 @@
+"""
+Offline benchmark and load test for the detection service.
+
+Everything runs locally: tiny randomly initialised stand-in models are
+generated (a 2-layer ViT image classifier and a 2-layer RoBERTa text
+classifier with its own BPE tokenizer), along with synthetic images, texts
+and ffmpeg test clips. Two parts:
+
+- stages: AIDetector.detect_image, detect_text and detect_video per item,
+  split into decode, preprocess (image processor / tokenizer), forward
+  (model call) and postprocess (everything else: softmax, verdicts, frame
+  quality filtering), plus the peak RSS of the process
+- http: the FastAPI app under uvicorn, hit on /detect with images and
+  texts at each concurrency level; latency percentiles, throughput, errors
+  and the server's peak RSS
+
+Results are written as JSON so runs can be compared between commits:
+
+    python -m benchmarks.suite --json before.json
+    python -m benchmarks.suite --json after.json --compare before.json
+
+With --compare, metrics that got worse by more than --tolerance percent
+are listed and the exit status is 1. --models configured benchmarks the
+models in IMAGE_MODEL_ID / TEXT_MODEL_ID instead of the stand-ins.
+Latency figures from stand-in models isolate the service's own overhead;
+they say little about real model cost. Linux only for server RSS.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import ffmpeg
+from PIL import Image
+
+from benchmarks.backends import synthetic_images, synthetic_texts
+from benchmarks.shared_memory import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("decode", "preprocess", "forward", "postprocess")
+
+
+def make_stand_in_models(directory: str) -> dict:
+    """Save a tiny random ViT image classifier and RoBERTa text classifier under ``directory``."""
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from tokenizers.processors import RobertaProcessing
+    from transformers import (
+        PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification,
+        ViTConfig, ViTForImageClassification, ViTImageProcessor
+    )
+
+    torch.manual_seed(0)
+    labels = {"id2label": {0: "real", 1: "fake"}, "label2id": {"real": 0, "fake": 1}}
+
+    image_dir = os.path.join(directory, "image-model")
+    image_model = ViTForImageClassification(ViTConfig(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        image_size=224, patch_size=32, **labels
+    ))
+    image_model.save_pretrained(image_dir)
+    ViTImageProcessor(size={"height": 224, "width": 224}, image_mean=[0.5] * 3, image_std=[0.5] * 3).save_pretrained(image_dir)
+
+    text_dir = os.path.join(directory, "text-model")
+    special_tokens = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(synthetic_texts(200), vocab_size=512, special_tokens=special_tokens)
+    bpe.post_processor = RobertaProcessing(("</s>", bpe.token_to_id("</s>")), ("<s>", bpe.token_to_id("<s>")))
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe._tokenizer, model_max_length=512,
+        bos_token="<s>", eos_token="</s>", sep_token="</s>", cls_token="<s>",
+        unk_token="<unk>", pad_token="<pad>", mask_token="<mask>"
+    )
+    tokenizer.save_pretrained(text_dir)
+    RobertaForSequenceClassification(RobertaConfig(
+        vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=514, bos_token_id=0, pad_token_id=1, eos_token_id=2,
+        **labels
+    )).save_pretrained(text_dir)
+
+    return {"IMAGE_MODEL_ID": image_dir, "TEXT_MODEL_ID": text_dir}
+
+
+def make_media(directory: str, images: int, texts: int, videos: int, video_seconds: float) -> dict:
+    """Write synthetic JPEG images and ffmpeg test clips; texts stay in memory."""
+    image_paths = []
+    for i, array in enumerate(synthetic_images(images)):
+        path = os.path.join(directory, f"image_{i:03d}.jpg")
+        Image.fromarray(array).save(path, quality=90)
+        image_paths.append(path)
+
+    video_paths = []
+    for i in range(videos):
+        path = os.path.join(directory, f"video_{i:02d}.mp4")
+        # Alternate a moving test pattern and a noisier one so frames are not all alike
+        source = "testsrc2" if i % 2 == 0 else "mandelbrot"
+        (
+            ffmpeg
+            .input(f"{source}=size=640x360:rate=25", f="lavfi")
+            .output(path, t=video_seconds, pix_fmt="yuv420p")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        video_paths.append(path)
+
+    return {"images": image_paths, "texts": synthetic_texts(texts), "videos": video_paths}
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p90/p95/p99 and mean of a list of seconds, in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {
+        "p50_ms": round(at(0.50), 2), "p90_ms": round(at(0.90), 2),
+        "p95_ms": round(at(0.95), 2), "p99_ms": round(at(0.99), 2),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+class Timed:
+    """Call-through proxy that adds the time spent in each call to a stage total."""
+
+    def __init__(self, target, stage: str, totals: dict):
+        self._target = target
+        self._stage = stage
+        self._totals = totals
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._target(*args, **kwargs)
+        finally:
+            self._totals[self._stage] += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+def run_stages(env: dict, media: dict, repeat: int) -> dict:
+    """Time AIDetector per item and per stage (runs in a child process)."""
+    os.environ.update(env)
+
+    from detectors import AIDetector
+    from video_frames import iter_planned, plan_frames
+
+    detector = AIDetector()
+    detector.load_models()
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    detector._image_inputs = Timed(detector._image_inputs, "preprocess", totals)
+    detector.image_model = Timed(detector.image_model, "forward", totals)
+    detector.text_tokenizer = Timed(detector.text_tokenizer, "preprocess", totals)
+    detector.text_model = Timed(detector.text_model, "forward", totals)
+
+    def decode_image(path):
+        Image.open(path).convert('RGB')
+
+    def decode_video(path):
+        info, grid_times, indices, _ = plan_frames(path, detector.video_sampling, detector.video_decode_mode)
+        for _ in iter_planned(path, info, grid_times, indices, detector.video_decode_mode):
+            pass
+
+    modalities = {
+        "image": (detector.detect_image, media["images"], decode_image),
+        "text": (detector.detect_text, media["texts"], None),
+        "video": (detector.detect_video, media["videos"], decode_video),
+    }
+
+    results = {}
+    for modality, (detect, items, decode) in modalities.items():
+        if not items:
+            continue
+        detect(items[0])  # warm-up
+
+        latencies = []
+        per_run = []
+        for _ in range(repeat):
+            totals.update({stage: 0.0 for stage in STAGES})
+            if decode is not None:
+                start = time.perf_counter()
+                for item in items:
+                    decode(item)
+                totals["decode"] = time.perf_counter() - start
+
+            run_start = time.perf_counter()
+            for item in items:
+                start = time.perf_counter()
+                detect(item)
+                latencies.append(time.perf_counter() - start)
+            elapsed = time.perf_counter() - run_start
+
+            stages = dict(totals)
+            stages["postprocess"] = max(0.0, elapsed - stages["decode"] - stages["preprocess"] - stages["forward"])
+            per_run.append({stage: seconds / len(items) for stage, seconds in stages.items()})
+
+        results[modality] = {
+            "items": len(items),
+            "stage_ms_per_item": {
+                stage: round(statistics.median(run[stage] for run in per_run) * 1000, 3) for stage in STAGES
+            },
+            "latency": percentiles(latencies),
+        }
+
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def multipart(field: str, filename: str, content: bytes, content_type: str) -> tuple:
+    """Encode one file as a multipart/form-data body; returns (body, content type header)."""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def post(url: str, body: bytes, content_type: str, timeout: float = 300) -> tuple:
+    """POST and return (status, seconds); status 0 means the connection failed."""
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def peak_rss_mb(pid: int) -> float:
+    """High-water resident set size of a process (VmHWM)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def run_http(env: dict, media: dict, requests: int, concurrency: list, startup_timeout: float) -> dict:
+    """Start the API under uvicorn and load-test /detect at each concurrency level."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+
+    payloads = {"image": [], "text": []}
+    for path in media["images"]:
+        with open(path, "rb") as f:
+            payloads["image"].append(multipart("file", os.path.basename(path), f.read(), "image/jpeg"))
+    for text in media["texts"]:
+        payloads["text"].append((urllib.parse.urlencode({"text": text}).encode(), "application/x-www-form-urlencoded"))
+
+    try:
+        start = time.perf_counter()
+        while True:
+            try:
+                with urllib.request.urlopen(f"{base}/ready", timeout=5) as response:
+                    if response.status == 200:
+                        break
+            except (urllib.error.HTTPError, OSError):
+                pass
+            if server.poll() is not None or time.perf_counter() - start > startup_timeout:
+                raise RuntimeError("API server did not become ready")
+            time.sleep(0.2)
+        ready_s = time.perf_counter() - start
+
+        results = {"ready_s": round(ready_s, 2), "scenarios": []}
+        for modality, bodies in payloads.items():
+            if not bodies:
+                continue
+            for workers in concurrency:
+                jobs = [bodies[i % len(bodies)] for i in range(requests)]
+                run_start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    outcomes = list(executor.map(lambda job: post(f"{base}/detect", *job), jobs))
+                elapsed = time.perf_counter() - run_start
+                latencies = [seconds for status, seconds in outcomes if status == 200]
+                results["scenarios"].append({
+                    "modality": modality,
+                    "concurrency": workers,
+                    "requests": requests,
+                    "errors": sum(status != 200 for status, _ in outcomes),
+                    "throughput_rps": round(len(latencies) / elapsed, 2),
+                    **percentiles(latencies),
+                })
+
+        results["server_peak_rss_mb"] = peak_rss_mb(server.pid)
+        return results
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def flatten(results: dict) -> dict:
+    """Comparable metrics keyed by path, with whether lower is better."""
+    metrics = {}
+    for modality, row in results.get("stages", {}).items():
+        if modality == "peak_rss_mb":
+            metrics["stages.peak_rss_mb"] = (row, True)
+            continue
+        for stage, value in row["stage_ms_per_item"].items():
+            metrics[f"stages.{modality}.{stage}_ms"] = (value, True)
+        metrics[f"stages.{modality}.p95_ms"] = (row["latency"]["p95_ms"], True)
+    http = results.get("http", {})
+    for row in http.get("scenarios", []):
+        key = f"http.{row['modality']}.c{row['concurrency']}"
+        metrics[f"{key}.throughput_rps"] = (row["throughput_rps"], False)
+        for name in ("p50_ms", "p95_ms", "p99_ms"):
+            if name in row:
+                metrics[f"{key}.{name}"] = (row[name], True)
+    if "server_peak_rss_mb" in http:
+        metrics["http.server_peak_rss_mb"] = (http["server_peak_rss_mb"], True)
+    return metrics
+
+
+def compare(baseline: dict, current: dict, tolerance_pct: float) -> list:
+    """Print metric changes against a baseline run; return the regressions past the tolerance."""
+    before, after = flatten(baseline), flatten(current)
+    regressions = []
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'} (tolerance {tolerance_pct:g}%):")
+    if baseline.get("options") != current.get("options"):
+        print("  (runs used different options, so differences may not be regressions)")
+    print(f"  {'metric':<40}{'before':>12}{'after':>12}{'change':>10}")
+    for key, (value, lower_is_better) in after.items():
+        if key not in before or not before[key][0]:
+            continue
+        change = (value - before[key][0]) / before[key][0] * 100
+        worse = change > tolerance_pct if lower_is_better else change < -tolerance_pct
+        if worse:
+            regressions.append(key)
+        print(f"  {key:<40}{before[key][0]:>12.2f}{value:>12.2f}{change:>+9.1f}%{'  !' if worse else ''}")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", nargs="+", choices=["stages", "http"], default=["stages", "http"])
+    parser.add_argument("--models", choices=["stand-in", "configured"], default="stand-in",
+                        help="tiny generated models (default) or IMAGE_MODEL_ID / TEXT_MODEL_ID")
+    parser.add_argument("--images", type=int, default=16, help="synthetic images")
+    parser.add_argument("--texts", type=int, default=16, help="synthetic texts")
+    parser.add_argument("--videos", type=int, default=2, help="synthetic clips (stages only)")
+    parser.add_argument("--video-seconds", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of the stage benchmark, median is reported")
+    parser.add_argument("--requests", type=int, default=100, help="HTTP requests per scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed slowdown in percent for --compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Results must come from the models under test, not the result cache
+        env = {"MODEL_CACHE_DIR": os.path.join(directory, "cache"), "DETECT_CACHE_SIZE": "0", "DETECT_CACHE_DB": ""}
+        if args.models == "stand-in":
+            env.update(make_stand_in_models(directory))
+        media = make_media(directory, args.images, args.texts, args.videos, args.video_seconds)
+
+        results = {
+            "benchmark": "suite",
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+            "options": {key: value for key, value in vars(args).items() if key not in ("json_path", "compare")},
+        }
+
+        if "stages" in args.parts:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                results["stages"] = executor.submit(run_stages, env, media, args.repeat).result()
+            print(f"Per-item stage timings (ms), peak RSS {results['stages']['peak_rss_mb']} MB")
+            print(f"  {'modality':<9}" + "".join(f"{stage:>12}" for stage in STAGES) + f"{'p50':>10}{'p95':>10}")
+            for modality in ("image", "text", "video"):
+                row = results["stages"].get(modality)
+                if row:
+                    print(f"  {modality:<9}" + "".join(f"{row['stage_ms_per_item'][stage]:>12.2f}" for stage in STAGES)
+                          + f"{row['latency']['p50_ms']:>10.2f}{row['latency']['p95_ms']:>10.2f}")
+
+        if "http" in args.parts:
+            results["http"] = run_http(env, media, args.requests, args.concurrency, args.startup_timeout)
+            http = results["http"]
+            print(f"\nHTTP /detect, {args.requests} requests per row, server ready in {http['ready_s']}s, "
+                  f"peak RSS {http['server_peak_rss_mb']} MB")
+            print(f"  {'modality':<9}{'conc':>5}{'req/s':>9}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+            for row in http["scenarios"]:
+                print(f"  {row['modality']:<9}{row['concurrency']:>5}{row['throughput_rps']:>9.1f}"
+                      f"{row.get('p50_ms', 0):>9.1f}{row.get('p90_ms', 0):>9.1f}{row.get('p95_ms', 0):>9.1f}"
+                      f"{row.get('p99_ms', 0):>9.1f}{row['errors']:>8}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:g}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure incremental re-scoring of edited long texts (TEXT_INCREMENTAL).
+
+Builds a synthetic draft, scores it once, then applies a series of small
+edits (a word changed, a sentence inserted or deleted), re-scoring after
+each. Reports, per round, how many segments the model re-ran out of those
+scored and the forward-pass time, and compares each document's AI
+probability with the sliding-window scoring of the same text:
+
+    python -m benchmarks.text_incremental
+    python -m benchmarks.text_incremental --sentences 400 --edits 20 --json out.json
+
+Uses TEXT_MODEL_ID; TEXT_MAX_WINDOWS applies to both modes as configured.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.backends import synthetic_texts
+
+
+def sentences(count: int) -> list:
+    return [text[:240].rsplit(" ", 1)[0].capitalize() + "." for text in synthetic_texts(count)]
+
+
+def edit(draft: list, rng: random.Random, pool: list) -> str:
+    """Apply one small edit to a list of sentences in place; returns its kind."""
+    position = rng.randrange(len(draft))
+    kind = rng.choice(["word", "insert", "delete"])
+    if kind == "word":
+        words = draft[position].split()
+        words[rng.randrange(len(words))] = rng.choice(pool[0].split())
+        draft[position] = " ".join(words)
+    elif kind == "insert":
+        draft.insert(position, rng.choice(pool))
+    elif len(draft) > 1:
+        del draft[position]
+    return kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=200, help="sentences in the draft")
+    parser.add_argument("--edits", type=int, default=10, help="edit rounds after the first submission")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    os.environ["TEXT_INCREMENTAL"] = "true"
+    from detectors import AIDetector
+
+    detector = AIDetector()
+    detector.load_models(["text"])
+    store = detector.text_segment_store
+
+    pool = sentences(args.sentences * 2)
+    draft = pool[:args.sentences]
+    rng = random.Random(0)
+
+    def score(text: str) -> dict:
+        start = time.perf_counter()
+        response = detector.detect("text", text=text)
+        windows = response.get("window_stats") or []
+        return {
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+            "forward_ms": response["timings"]["stages_ms"].get("forward", 0.0),
+            "segments": len(windows),
+            "rescored": sum(not window.get("reused", False) for window in windows),
+            "ai_prob": response["ai_prob"],
+        }
+
+    def sliding_ai_prob(text: str) -> float:
+        detector.text_segment_store = None
+        try:
+            return detector.detect("text", text=text)["ai_prob"]
+        finally:
+            detector.text_segment_store = store
+
+    print(f"{len(' '.join(draft))} characters, TEXT_MAX_WINDOWS={detector.text_max_windows}")
+    print(f"  {'round':<8}{'edit':<8}{'segments':>9}{'rescored':>10}{'fwd ms':>9}{'total ms':>10}"
+          f"{'ai prob':>9}{'sliding':>9}")
+    rows = []
+    for round_number in range(args.edits + 1):
+        kind = edit(draft, rng, pool[args.sentences:]) if round_number else "-"
+        text = " ".join(draft)
+        row = {"round": round_number, "edit": kind, **score(text), "sliding_ai_prob": sliding_ai_prob(text)}
+        rows.append(row)
+        print(f"  {round_number:<8}{kind:<8}{row['segments']:>9}{row['rescored']:>10}{row['forward_ms']:>9.1f}"
+              f"{row['ms']:>10.1f}{row['ai_prob']:>9.2f}{row['sliding_ai_prob']:>9.2f}")
+    print(f"segment store: {store.stats()}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "text_incremental", "results": rows, "store": store.stats()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
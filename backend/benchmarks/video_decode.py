@@ -0,0 +1,88 @@
+"""
+Compare the per-frame seek decoder with the single-pass streaming decoder.
+
+Generates synthetic clips with ffmpeg (no models are loaded) and reports
+wall-clock time and per-frame cost for each decode mode:
+
+    python -m benchmarks.video_decode
+    python -m benchmarks.video_decode --durations 10 300 --repeat 3 --json out.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import ffmpeg
+
+from video_frames import choose_decode_mode, iter_frames, probe_video, sample_times
+
+
+def make_clip(path: str, duration: float, size: str = "1280x720", rate: int = 30):
+    """Render a synthetic H.264 test clip with ffmpeg."""
+    (
+        ffmpeg
+        .input(f"testsrc2=duration={duration}:size={size}:rate={rate}", f="lavfi")
+        .output(path, vcodec="libx264", pix_fmt="yuv420p", preset="veryfast")
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+def time_decode(video_path: str, mode: str, repeat: int) -> dict:
+    """Decode every sampled frame `repeat` times and summarise the timings."""
+    timings = []
+    n_frames = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_frames = sum(1 for _ in iter_frames(video_path, mode=mode))
+        timings.append(time.perf_counter() - start)
+
+    wall = statistics.median(timings)
+    return {
+        "mode": mode,
+        "frames": n_frames,
+        "wall_s": round(wall, 4),
+        "per_frame_ms": round(wall / max(n_frames, 1) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 300],
+                        help="clip lengths in seconds (default: 10 300)")
+    parser.add_argument("--size", default="1280x720", help="clip resolution (default: 1280x720)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode, median is reported")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for duration in args.durations:
+            clip = os.path.join(workdir, f"clip_{int(duration)}s.mp4")
+            make_clip(clip, duration, size=args.size)
+
+            rows = [time_decode(clip, mode, args.repeat) for mode in ("stream", "seek")]
+            by_mode = {row["mode"]: row for row in rows}
+            speedup = by_mode["seek"]["wall_s"] / max(by_mode["stream"]["wall_s"], 1e-9)
+            info = probe_video(clip)
+            auto_mode = choose_decode_mode(info, sample_times(info["duration"]))
+
+            print(f"{duration:>6.0f}s clip ({args.size})")
+            for row in rows:
+                print(f"  {row['mode']:<7} {row['frames']:>3} frames  "
+                      f"{row['wall_s']:>8.3f}s  {row['per_frame_ms']:>8.2f} ms/frame")
+            print(f"  stream speedup: {speedup:.1f}x  (auto picks {auto_mode})")
+
+            results.append({"duration_s": duration, "size": args.size, "modes": rows,
+                            "stream_speedup": round(speedup, 2), "auto_mode": auto_mode})
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "video_decode", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
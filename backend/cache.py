@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of submitted text: NFC, trimmed, whitespace runs collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(content_type: str, digest: str, fingerprint: str) -> str:
+    """Cache key for a piece of content under a given model/threshold configuration."""
+    return hashlib.sha256(f"{fingerprint}|{content_type}|{digest}".encode()).hexdigest()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed detection results: an in-memory LRU plus an optional SQLite tier.
+
+    Entries expire ``ttl_seconds`` after they were stored, in both tiers.
+    The in-memory tier holds at most ``max_entries`` results and evicts the
+    least recently used; the SQLite tier (enabled by ``db_path``) survives
+    restarts, holds at most ``max_disk_entries`` and promotes hits back into
+    memory.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 86400,
+                 db_path: Optional[str] = None, max_disk_entries: int = 1_000_000):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.db_path = db_path
+        self._db = None
+        self._db_pid = None
+        self._disk_writes = 0
+        if db_path:
+            self._connect()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+            self._db.commit()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db_pid = os.getpid()
+
+    def _reconnect_after_fork(self):
+        # SQLite connections must not cross fork (e.g. gunicorn preload_app),
+        # so a forked process opens its own
+        if self._db is not None and self._db_pid != os.getpid():
+            self._connect()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached result for key, or None."""
+        now = time.time()
+        with self._lock:
+            self._reconnect_after_fork()
+
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: dict):
+        """Store a result in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._reconnect_after_fork()
+            self._remember(key, now, value)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now)
+                )
+                # Expiry and size pruning scan the table, so only run them now and then
+                self._disk_writes += 1
+                if self._disk_writes % 256 == 0:
+                    self._prune_disk(now)
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and tier sizes."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk": self._db is not None,
+        }
+
+    def _remember(self, key: str, stored_at: float, value: dict):
+        if not self.max_entries:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self, now: float):
+        self._db.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl,))
+        overflow = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY stored_at LIMIT ?)", (overflow,)
+            )
@@ -0,0 +1,326 @@
+import json
+import math
+import re
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Lower-case names of generators, as written to EXIF Software, PNG Software,
+# XMP CreatorTool, C2PA claim generators and software agents, or container
+# software tags; matched as whole names, so "imagenomic" is not "imagen"
+GENERATOR_MARKERS = (
+    "stable diffusion", "stable-diffusion", "stablediffusion", "midjourney", "dall-e", "dall·e",
+    "novelai", "comfyui", "automatic1111", "invokeai", "fooocus", "adobe firefly", "chatgpt",
+    "openai-api", "google imagen", "flux.1", "leonardo.ai", "ideogram", "runwayml", "pika labs",
+)
+_GENERATOR_NAME = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(marker) for marker in GENERATOR_MARKERS) + r")(?![a-z0-9])"
+)
+
+# IPTC digital source types for generated media (also matches
+# compositeWithTrainedAlgorithmicMedia), used by XMP and C2PA actions
+SOURCE_TYPE_MARKERS = ("trainedalgorithmicmedia",)
+
+# PNG text chunks written only by image generators; "parameters" (Stable
+# Diffusion web UIs) counts when it holds their "Steps:" line
+GENERATOR_KEYS = {"sd-metadata", "invokeai_metadata", "workflow", "prompt", "dream"}
+
+# EXIF Software: the only EXIF tag that names the generating software (not
+# ImageDescription, Artist or UserComment, which hold the user's own words)
+EXIF_SOFTWARE = 0x0131
+
+# XMP properties naming the creating tool or the IPTC digital source type,
+# as attributes (xmp:CreatorTool="...") or elements (with text or rdf:resource)
+_XMP_FIELD = re.compile(rb'(CreatorTool|DigitalSourceType)(?:\s*=\s*"([^"]*)"|([^<>]*)>([^<]*))', re.IGNORECASE)
+
+# C2PA manifest (CBOR) keys naming the generator, and the actions' source type
+C2PA_GENERATOR_KEYS = ("claim_generator", "claim_generator_info", "softwareAgent")
+C2PA_SOURCE_TYPE_KEY = "digitalSourceType"
+
+# Container and stream tags that name the software that wrote a video
+VIDEO_GENERATOR_TAGS = {"software", "encoder", "encoded_by", "com.apple.quicktime.software"}
+
+# Metadata fields are searched up to this many bytes (C2PA manifests may embed thumbnails)
+MAX_FIELD_BYTES = 1 << 20
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value[:MAX_FIELD_BYTES].decode("latin-1").lower()
+    return str(value)[:MAX_FIELD_BYTES].lower()
+
+
+def _find_marker(value) -> Optional[str]:
+    """Generator name in a generator field (a tool name, not free text), or None."""
+    match = _GENERATOR_NAME.search(_text(value))
+    return match.group(1) if match else None
+
+
+def _find_source_type(value) -> Optional[str]:
+    """Generated-media marker in a digital source type field, or None."""
+    text = _text(value)
+    return next((marker for marker in SOURCE_TYPE_MARKERS if marker in text), None)
+
+
+def _cbor_key(key: str) -> bytes:
+    """CBOR encoding of a short text string (a map key)."""
+    return bytes([0x60 + len(key)]) + key.encode() if len(key) < 24 else bytes([0x78, len(key)]) + key.encode()
+
+
+def _cbor_text(data: bytes, offset: int) -> Optional[str]:
+    """The CBOR text string starting at ``offset``, or None if another item starts there."""
+    if offset >= len(data) or data[offset] >> 5 != 3 or data[offset] & 0x1F > 27:
+        return None
+    length, start = data[offset] & 0x1F, offset + 1
+    if length >= 24:
+        size = 1 << (length - 24)
+        length = int.from_bytes(data[start:start + size], "big")
+        start += size
+    return data[start:start + length].decode("utf-8", "replace")
+
+
+def _cbor_values(data: bytes, key: str) -> Iterator[str]:
+    """Text values of a CBOR map key wherever it occurs in a C2PA manifest.
+
+    A value that is a map or array (claim_generator_info, C2PA 2 software
+    agents) stands for the "name" inside it.
+    """
+    name = _cbor_key("name")
+    for match in re.finditer(re.escape(_cbor_key(key)), data[:MAX_FIELD_BYTES]):
+        value = _cbor_text(data, match.end())
+        if value is None:
+            inner = data.find(name, match.end(), match.end() + 64)
+            value = _cbor_text(data, inner + len(name)) if inner >= 0 else None
+        if value is not None:
+            yield value
+
+
+def _xmp_fields(xmp) -> Iterator[Tuple[str, str, str]]:
+    """("generator" or "source_type", field, value) for an XMP packet's CreatorTool and DigitalSourceType."""
+    if isinstance(xmp, str):
+        xmp = xmp.encode("utf-8", "replace")
+    for match in _XMP_FIELD.finditer(xmp[:MAX_FIELD_BYTES]):
+        name = match.group(1).decode()
+        value = b" ".join(part for part in match.groups()[1:] if part).decode("utf-8", "replace")
+        yield ("source_type" if name.lower() == "digitalsourcetype" else "generator"), f"xmp:{name}", value
+
+
+def _c2pa_fields(data: bytes) -> Iterator[Tuple[str, str, str]]:
+    """("generator" or "source_type", field, value) for a C2PA manifest's claim generators, agents and source types."""
+    for key in C2PA_GENERATOR_KEYS:
+        for value in _cbor_values(data, key):
+            yield "generator", f"c2pa:{key}", value
+    for value in _cbor_values(data, C2PA_SOURCE_TYPE_KEY):
+        yield "source_type", f"c2pa:{C2PA_SOURCE_TYPE_KEY}", value
+
+
+def _image_fields(image: Image.Image) -> Iterator[Tuple[str, str, object]]:
+    """(kind, field, value) for an opened image's metadata fields that identify a generator.
+
+    kind is "key" for PNG text chunks written by generators, "generator"
+    for fields naming the creating software and "source_type" for IPTC
+    digital source types. Captions, comments and other free text are left out.
+    """
+    for key, value in image.info.items():
+        if not isinstance(value, (str, bytes)):
+            continue
+        if key.lower() in GENERATOR_KEYS or key.lower() == "parameters":
+            yield "key", key, value
+        elif key.lower() == "software":
+            yield "generator", key, value
+    xmp = image.info.get("xmp")
+    if xmp is None:
+        # Older Pillow leaves a JPEG's XMP in its APP1 segment
+        xmp = next((data for marker, data in getattr(image, "applist", [])
+                    if marker == "APP1" and data.startswith(b"http://ns.adobe.com/xap/")), None)
+    if xmp:
+        yield from _xmp_fields(xmp)
+    for marker, data in getattr(image, "applist", []):
+        # JPEG APP11 holds the C2PA JUMBF boxes
+        if marker == "APP11":
+            yield from _c2pa_fields(data)
+    for chunk, data in getattr(image, "private_chunks", []):
+        # PNG C2PA manifest chunk
+        if chunk == b"caBX":
+            yield from _c2pa_fields(data)
+    if "exif" not in image.info and image.format != "TIFF":
+        # PngImageFile.getexif would decode the whole image looking for a late eXIf chunk
+        return
+    software = image.getexif().get(EXIF_SOFTWARE)
+    if software:
+        yield "generator", "exif:Software", software
+
+
+def image_provenance(source) -> Optional[Dict[str, str]]:
+    """Generator marker in an image's metadata: {"field": ..., "marker": ...}, or None.
+
+    Only the header is parsed, not the pixels. A file object is rewound to
+    where it was, ready to be decoded.
+    """
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with Image.open(source) as image:
+            for kind, field, value in _image_fields(image):
+                if kind == "key":
+                    if field.lower() in GENERATOR_KEYS and _text(value).strip():
+                        return {"field": field, "marker": field.lower()}
+                    if field.lower() == "parameters" and "steps:" in _text(value):
+                        return {"field": field, "marker": "steps:"}
+                    continue
+                marker = _find_source_type(value) if kind == "source_type" else _find_marker(value)
+                if marker:
+                    return {"field": field, "marker": marker}
+    finally:
+        if position is not None:
+            source.seek(position)
+    return None
+
+
+def video_provenance(video_path: str) -> Optional[Dict[str, str]]:
+    """Generator name in a video's container or stream software tags, or None."""
+    import ffmpeg
+
+    probe = ffmpeg.probe(video_path)
+    tagged = [("format", probe.get("format", {}))] + [
+        (f"stream{stream.get('index', '')}", stream) for stream in probe.get("streams", [])
+    ]
+    for prefix, entry in tagged:
+        for key, value in (entry.get("tags") or {}).items():
+            if key.lower() not in VIDEO_GENERATOR_TAGS:
+                continue
+            marker = _find_marker(value)
+            if marker:
+                return {"field": f"{prefix}:{key}", "marker": marker}
+    return None
+
+
+# Features of the linear stage, in the order the model's weights expect
+IMAGE_FEATURES = (
+    "luma_mean", "luma_std", "saturation_mean", "saturation_std", "colorfulness",
+    "log_laplacian_var", "high_freq_ratio", "clipped_fraction", "log_aspect_ratio",
+)
+TEXT_FEATURES = (
+    "log_words", "type_token_ratio", "word_length", "sentence_length", "sentence_length_cv",
+    "commas_per_word", "punctuation_per_word", "uppercase_fraction", "digit_fraction", "lines_per_sentence",
+)
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s+|$)|\n+")
+
+
+def image_features(image: Image.Image) -> np.ndarray:
+    """Cheap global statistics of an RGB image, computed on a 128x128 thumbnail."""
+    width, height = image.size
+    pixels = np.asarray(image.resize((128, 128), Image.BILINEAR), dtype=np.float32) / 255.0
+    gray = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    saturation = pixels.max(axis=2) - pixels.min(axis=2)
+    red_green = pixels[..., 0] - pixels[..., 1]
+    yellow_blue = (pixels[..., 0] + pixels[..., 1]) / 2 - pixels[..., 2]
+    colorfulness = math.hypot(red_green.std(), yellow_blue.std()) + 0.3 * math.hypot(red_green.mean(), yellow_blue.mean())
+
+    spectrum = np.abs(np.fft.fftshift(np.fft.fft2(gray - gray.mean()))) ** 2
+    y, x = np.ogrid[-64:64, -64:64]
+    high = spectrum[(x * x + y * y) > 32 * 32].sum()
+
+    return np.array([
+        gray.mean(),
+        gray.std(),
+        saturation.mean(),
+        saturation.std(),
+        colorfulness,
+        math.log1p(float(cv2.Laplacian(gray, cv2.CV_32F).var()) * 255 * 255),
+        high / max(float(spectrum.sum()), 1e-9),
+        float(((pixels < 0.01) | (pixels > 0.99)).mean()),
+        math.log(width / height),
+    ], dtype=np.float64)
+
+
+def text_features(text: str) -> np.ndarray:
+    """Cheap stylometric statistics of a text: lengths, vocabulary, punctuation."""
+    words = _WORD.findall(text.lower())
+    n_words = max(len(words), 1)
+    sentences = [len(_WORD.findall(part)) for part in _SENTENCE_END.split(text)]
+    sentences = [length for length in sentences if length] or [0]
+    n_chars = max(len(text), 1)
+    punctuation = sum(text.count(mark) for mark in ";:!?()\"'-")
+    return np.array([
+        math.log1p(len(words)),
+        len(set(words[:500])) / max(min(len(words), 500), 1),
+        sum(len(word) for word in words) / n_words,
+        float(np.mean(sentences)),
+        float(np.std(sentences) / max(np.mean(sentences), 1e-9)),
+        text.count(",") / n_words,
+        punctuation / n_words,
+        sum(char.isupper() for char in text) / n_chars,
+        sum(char.isdigit() for char in text) / n_chars,
+        text.count("\n") / len(sentences),
+    ], dtype=np.float64)
+
+
+class LinearModel:
+    """Logistic regression over standardized cheap features.
+
+    Fitted by distillation: the targets are the transformer model's AI
+    probabilities on a sample, so the model learns to agree with it where
+    the cheap features are enough.
+    """
+
+    def __init__(self, features: Sequence[str], mean: Sequence[float], std: Sequence[float],
+                 weights: Sequence[float], bias: float):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+
+    @classmethod
+    def fit(cls, features: Sequence[str], X: np.ndarray, targets: np.ndarray, l2: float = 1e-3,
+            steps: int = 2000, learning_rate: float = 0.5) -> "LinearModel":
+        """Fit by gradient descent on cross-entropy against (soft) targets in [0, 1]."""
+        X = np.asarray(X, dtype=np.float64)
+        targets = np.asarray(targets, dtype=np.float64)
+        mean, std = X.mean(axis=0), X.std(axis=0)
+        std[std < 1e-9] = 1.0
+        Z = (X - mean) / std
+        weights, bias = np.zeros(Z.shape[1]), 0.0
+        for _ in range(steps):
+            error = 1 / (1 + np.exp(-(Z @ weights + bias))) - targets
+            weights -= learning_rate * (Z.T @ error / len(Z) + l2 * weights)
+            bias -= learning_rate * error.mean()
+        return cls(features, mean, std, weights, bias)
+
+    def predict(self, x: np.ndarray) -> float:
+        """AI probability for one feature vector."""
+        logit = float(((x - self.mean) / self.std) @ self.weights + self.bias)
+        return 1 / (1 + math.exp(-max(-50.0, min(50.0, logit))))
+
+    def to_dict(self) -> dict:
+        return {
+            "features": self.features,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "weights": self.weights.tolist(),
+            "bias": self.bias,
+        }
+
+
+def load_linear_models(path: str) -> Dict[str, LinearModel]:
+    """Per-modality linear models ("image", "text") from a JSON file written by save_linear_models."""
+    with open(path) as f:
+        entries = json.load(f)
+    models = {}
+    for modality, expected in (("image", IMAGE_FEATURES), ("text", TEXT_FEATURES)):
+        if modality not in entries:
+            continue
+        model = LinearModel(**entries[modality])
+        if model.features != list(expected):
+            raise ValueError(f"{path}: {modality} model was fitted on other features; refit it")
+        models[modality] = model
+    return models
+
+
+def save_linear_models(path: str, models: Dict[str, LinearModel]):
+    with open(path, "w") as f:
+        json.dump({modality: model.to_dict() for modality, model in models.items()}, f, indent=2)
@@ -0,0 +1,130 @@
+import mimetypes
+import os
+
+# Model identifiers, thresholds and backend selection. Kept free of torch,
+# transformers and cv2 so the API process can import it without loading them.
+
+# Hugging Face model identifiers (or local model directories)
+IMAGE_MODEL_ID = os.getenv("IMAGE_MODEL_ID", "orion-ai/ai-image-detector")
+TEXT_MODEL_ID = os.getenv("TEXT_MODEL_ID", "roberta-base-openai-detector")
+
+# Verdict thresholds on the AI probability
+AI_THRESHOLD = 0.7
+HUMAN_THRESHOLD = 0.3
+
+# Video: minimum Laplacian variance for a frame to be scored, and the share
+# of scored frames (in %) that must agree for a confident video verdict
+QUALITY_THRESHOLD = 80
+VIDEO_AGREEMENT_PCT = 70
+
+# Video: sample 1 fps, but never more than this many frames per video
+MAX_FRAMES = 64
+
+# Inference backends: eager fp32 PyTorch, dynamic int8-quantized PyTorch,
+# or an exported ONNX Runtime session (the last two run on CPU)
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+
+# Image preprocessing: batched PyTorch ops mirroring the image processor's
+# config, or the Hugging Face image processor itself
+PREPROCESS_MODES = ("tensor", "processor")
+
+# Cheap-first cascade stages, always run in this order before the models:
+# generator markers in metadata, then a linear model over cheap features
+CASCADE_STAGES = ("metadata", "linear")
+
+# Models with their own weights, each loaded "eager" (at startup) or "lazy" (on first use)
+MODALITIES = ("image", "text")
+LOADING_MODES = ("eager", "lazy")
+
+# Detector settings that can change a verdict, with their defaults. AIDetector
+# reads them through setting() and config_fingerprint covers every one, so
+# cached results never outlive a change to any of them
+VERDICT_SETTINGS = {
+    "IMAGE_PREPROCESS": "tensor",
+    "IMAGE_REDUCED_DECODE": "true",
+    "VIDEO_DECODE_MODE": "auto",
+    "VIDEO_SAMPLING": "uniform",
+    "VIDEO_MIN_FRAMES": "8",
+    "VIDEO_DISTINCT_THRESHOLD": "6",
+    "VIDEO_EARLY_EXIT": "false",
+    "TEXT_LONG_MODE": "true",
+    "TEXT_MAX_WINDOWS": "16",
+    "TEXT_WINDOW_OVERLAP": "128",
+    "TEXT_INCREMENTAL": "false",
+    "PHASH_INDEX": "false",
+    "PHASH_ALGORITHM": "phash",
+    "PHASH_MAX_DISTANCE": "4",
+    "CASCADE_STAGES": "",
+    "CASCADE_MODEL_PATH": "",
+    "CASCADE_LINEAR_AI": "0.97",
+    "CASCADE_LINEAR_HUMAN": "0.03",
+}
+
+
+def setting(name: str) -> str:
+    """A VERDICT_SETTINGS value from the environment, or its default."""
+    return os.getenv(name, VERDICT_SETTINGS[name])
+
+
+def backend_from_env(modality: str) -> str:
+    """Backend for one model: {IMAGE,TEXT}_BACKEND, falling back to INFERENCE_BACKEND."""
+    backend = os.getenv(f"{modality.upper()}_BACKEND") or os.getenv("INFERENCE_BACKEND", "torch")
+    backend = backend.lower()
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"{modality.upper()}_BACKEND must be one of {INFERENCE_BACKENDS}")
+    return backend
+
+
+def loading_from_env(modality: str) -> str:
+    """Loading mode for one model: {IMAGE,TEXT}_MODEL_LOADING, falling back to MODEL_LOADING."""
+    mode = os.getenv(f"{modality.upper()}_MODEL_LOADING") or os.getenv("MODEL_LOADING", "eager")
+    mode = mode.lower()
+    if mode not in LOADING_MODES:
+        raise ValueError(f"{modality.upper()}_MODEL_LOADING must be one of {LOADING_MODES}")
+    return mode
+
+
+def cascade_from_env() -> tuple:
+    """Cascade stages enabled by CASCADE_STAGES (comma-separated), in cascade order; empty when off."""
+    stages = {stage.strip().lower() for stage in setting("CASCADE_STAGES").split(",") if stage.strip()}
+    if stages - set(CASCADE_STAGES):
+        raise ValueError(f"CASCADE_STAGES must be a comma-separated subset of {CASCADE_STAGES}")
+    return tuple(stage for stage in CASCADE_STAGES if stage in stages)
+
+
+def config_fingerprint() -> str:
+    """Identify the models, thresholds and settings that produce a verdict (used in cache keys)."""
+    return "|".join(str(part) for part in (
+        IMAGE_MODEL_ID, TEXT_MODEL_ID, AI_THRESHOLD, HUMAN_THRESHOLD,
+        QUALITY_THRESHOLD, VIDEO_AGREEMENT_PCT, MAX_FRAMES,
+        backend_from_env("image"), backend_from_env("text"),
+        *(setting(name) for name in VERDICT_SETTINGS)
+    ))
+
+
+def get_content_type(filename: str) -> str:
+    """Determine content type based on file extension."""
+    if not filename:
+        return "unknown"
+
+    # Get MIME type
+    mime_type, _ = mimetypes.guess_type(filename)
+
+    if mime_type:
+        if mime_type.startswith('image/'):
+            return "image"
+        elif mime_type.startswith('video/'):
+            return "video"
+
+    # Fallback to file extension
+    ext = filename.lower().split('.')[-1] if '.' in filename else ''
+
+    image_extensions = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff'}
+    video_extensions = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv', 'm4v'}
+
+    if ext in image_extensions:
+        return "image"
+    elif ext in video_extensions:
+        return "video"
+
+    return "unknown"
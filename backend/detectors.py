@@ -1,8 +1,10 @@
+import logging
 import os
-import tempfile
-from typing import Tuple, Union, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Tuple, Union, Dict, List, Optional
 from datetime import datetime
-import ffmpeg
 from PIL import Image
 import cv2
 import torch
@@ -11,312 +13,1037 @@ from transformers import (
     AutoImageProcessor, 
     AutoModelForImageClassification,
     AutoTokenizer,
-    AutoModelForSequenceClassification,
-    pipeline
+    AutoModelForSequenceClassification
 )
 import numpy as np
+import phash
+from backends import backend_device, load_backend
+from cascade import image_features, image_provenance, load_linear_models, text_features, video_provenance
+from config import (
+    AI_THRESHOLD, HUMAN_THRESHOLD, IMAGE_MODEL_ID, MODALITIES, PREPROCESS_MODES, QUALITY_THRESHOLD,
+    TEXT_MODEL_ID, VIDEO_AGREEMENT_PCT, backend_from_env, cascade_from_env, loading_from_env, setting
+)
+from pipeline import Pipeline, Stage
+from preprocessing import ImageTooLarge, TensorPreprocessor, decode_size, open_image
+from segments import SegmentStore, plan_segments, segment_key
+from telemetry import collect_spans, span, stage_timings, timed_iter
+from video_frames import DECODE_MODES, SAMPLING_MODES, iter_planned, plan_frames, split_planned
+
+logger = logging.getLogger(__name__)
+
+# Attributes set when each model loads; reading one before then loads that model
+MODEL_ATTRIBUTES = {
+    "image": ("image_processor", "image_pixels", "image_decode_size", "image_model", "image_labels",
+              "image_backend", "image_device"),
+    "text": ("text_tokenizer", "text_model", "text_labels", "text_backend", "text_device",
+             "text_window_tokens", "text_window_overlap"),
+}
+
+
+def video_verdict(ai_probs: List[float]) -> Tuple[str, float, float, float]:
+    """Video verdict from per-frame AI probabilities: (result, final_prob, pct_high, pct_low)."""
+    ai_probs = np.asarray(ai_probs, dtype=float)
+    n_frames = len(ai_probs)
+    if not n_frames:
+        return "Unclear / Mixed", 0.0, 0.0, 0.0
+    
+    # Trimmed mean (top 50% frames)
+    sorted_probs = np.sort(ai_probs)
+    trim_size = n_frames // 2
+    final_prob = np.mean(sorted_probs[-trim_size:])
+    
+    # Calculate percentage statistics using new thresholds
+    pct_high = np.sum(ai_probs > AI_THRESHOLD) / n_frames * 100
+    pct_low = np.sum(ai_probs < HUMAN_THRESHOLD) / n_frames * 100
+    
+    # Enhanced verdict rules with normalized confidence thresholds
+    if final_prob > AI_THRESHOLD and pct_high >= VIDEO_AGREEMENT_PCT:
+        result = "Likely AI-Generated"
+    elif final_prob < HUMAN_THRESHOLD and pct_low >= VIDEO_AGREEMENT_PCT:
+        result = "Likely Human-Created"
+    else:
+        result = "Unclear / Mixed"
+    return result, final_prob, pct_high, pct_low
+
+
+def video_verdict_settled(ai_probs: List[float], remaining: int) -> bool:
+    """Whether no scores for up to ``remaining`` more frames could change the video verdict.
+
+    The trimmed mean and pct_high only grow as any frame's probability
+    grows, and pct_low only shrinks, so "AI" is hardest to keep when every
+    new frame scores 0, "Human" when every new frame scores 1, and
+    "Unclear" holds if neither all-1s nor all-0s reaches another verdict.
+    Every count of new frames from 0 to ``remaining`` is checked, since the
+    quality filter may drop any of them.
+    """
+    ai_probs = list(ai_probs)
+    result = video_verdict(ai_probs)[0]
+    for extra in range(remaining + 1):
+        with_lows = video_verdict(ai_probs + [0.0] * extra)[0]
+        with_highs = video_verdict(ai_probs + [1.0] * extra)[0]
+        if result == "Likely AI-Generated":
+            settled = with_lows == result
+        elif result == "Likely Human-Created":
+            settled = with_highs == result
+        else:
+            settled = with_lows != "Likely Human-Created" and with_highs != "Likely AI-Generated"
+        if not settled:
+            return False
+    return True
+
+
+def frames_until_settled(ai_probs: List[float], remaining: int) -> int:
+    """Fewest further frames after which the verdict could be settled, at best.
+
+    Assumes every new frame agrees with the current verdict as strongly as
+    possible; used to size the next batch, not to decide anything.
+    """
+    ai_probs = list(ai_probs)
+    result = video_verdict(ai_probs)[0]
+    agreeing = {"Likely AI-Generated": 1.0, "Likely Human-Created": 0.0}.get(result, 0.5)
+    for extra in range(1, remaining + 1):
+        if video_verdict_settled(ai_probs + [agreeing] * extra, remaining - extra):
+            return extra
+    return max(1, remaining)
+
 
 class AIDetector:
     def __init__(self):
-        # Initialize image detection model
-        self.image_processor = AutoImageProcessor.from_pretrained("orion-ai/ai-image-detector")
-        self.image_model = AutoModelForImageClassification.from_pretrained("orion-ai/ai-image-detector")
+        # Models load per modality: "eager" ones in load_models() (called at
+        # startup, concurrently), "lazy" ones on first use
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model_loading = {modality: loading_from_env(modality) for modality in MODALITIES}
+        self.model_state = {modality: "unloaded" for modality in MODALITIES}
+        self.model_load_seconds = {modality: None for modality in MODALITIES}
+        self._model_locks = {modality: threading.Lock() for modality in MODALITIES}
         
-        # Initialize text detection model
-        self.text_tokenizer = AutoTokenizer.from_pretrained("roberta-base-openai-detector")
-        self.text_model = AutoModelForSequenceClassification.from_pretrained("roberta-base-openai-detector")
+        # Run one dummy forward pass right after a model loads
+        self.warm_up = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'
         
-        # Move models to GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.image_model.to(self.device)
-        self.text_model.to(self.device)
+        # Image preprocessing: "tensor" (batched resize and normalize in
+        # PyTorch, matching the image processor's config) or "processor"
+        # (the Hugging Face image processor, one PIL image at a time)
+        self.image_preprocess = setting('IMAGE_PREPROCESS').lower()
+        if self.image_preprocess not in PREPROCESS_MODES:
+            raise ValueError(f"IMAGE_PREPROCESS must be one of {PREPROCESS_MODES}")
+        
+        # Uploaded images decode close to the model's input size (JPEG DCT
+        # scaling, integer reduction for other formats) unless
+        # IMAGE_REDUCED_DECODE=false, and are rejected when they would decode
+        # to more than IMAGE_MAX_PIXELS pixels
+        self.image_reduced_decode = setting('IMAGE_REDUCED_DECODE').lower() == 'true'
+        self.image_max_pixels = int(os.getenv('IMAGE_MAX_PIXELS', '50000000'))
+        
+        # Video frame decoding: "stream" (single ffmpeg pass over a pipe),
+        # "seek" (one ffmpeg process and temp JPEG per sampled frame) or
+        # "auto" (whichever decodes fewer frames for the clip)
+        self.video_decode_mode = setting('VIDEO_DECODE_MODE').lower()
+        if self.video_decode_mode not in DECODE_MODES:
+            raise ValueError(f"VIDEO_DECODE_MODE must be one of {DECODE_MODES}")
+        
+        # Frame sampling: "uniform" (1 fps up to MAX_FRAMES) or "adaptive"
+        # (sharpest, visually distinct frames picked from a low-res pass;
+        # at least VIDEO_MIN_FRAMES, distinct by VIDEO_DISTINCT_THRESHOLD)
+        self.video_sampling = setting('VIDEO_SAMPLING').lower()
+        if self.video_sampling not in SAMPLING_MODES:
+            raise ValueError(f"VIDEO_SAMPLING must be one of {SAMPLING_MODES}")
+        self.video_min_frames = max(1, int(setting('VIDEO_MIN_FRAMES')))
+        self.video_distinct_threshold = float(setting('VIDEO_DISTINCT_THRESHOLD'))
+        
+        # Early exit: score a coarse pass over the whole clip first and stop
+        # once no remaining frame could change the verdict
+        self.video_early_exit = setting('VIDEO_EARLY_EXIT').lower() == 'true'
         
-        # Set models to evaluation mode
-        self.image_model.eval()
-        self.text_model.eval()
+        # Video frames are scored in batches of up to VIDEO_BATCH_SIZE frames,
+        # flushed early once the buffered RGB frames exceed VIDEO_BATCH_MAX_MB
+        self.video_batch_size = max(1, int(os.getenv('VIDEO_BATCH_SIZE', '16')))
+        self.video_batch_max_bytes = int(float(os.getenv('VIDEO_BATCH_MAX_MB', '256')) * 1024 * 1024)
         
-        # Get model labels for debugging
-        self.image_labels = self.image_model.config.id2label
-        self.text_labels = self.text_model.config.id2label
+        # Video pipeline: decode, quality filter, preprocessing and inference
+        # run concurrently, VIDEO_<STAGE>_WORKERS threads each, joined by
+        # queues of VIDEO_QUEUE_SIZE items. "auto" pipelines when more than
+        # one CPU is available; with one, the stages would only take turns.
+        # Decode workers above 1 only split seek decoding; a streaming pass
+        # is one sequential read
+        video_pipeline = os.getenv('VIDEO_PIPELINE', 'auto').lower()
+        if video_pipeline == 'auto':
+            cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+            self.video_pipeline = cpus > 1
+        else:
+            self.video_pipeline = video_pipeline == 'true'
+        self.video_stage_workers = {
+            stage: max(1, int(os.getenv(f'VIDEO_{stage.upper()}_WORKERS', default)))
+            for stage, default in (("decode", "1"), ("quality", "2"), ("preprocess", "1"), ("inference", "1"))
+        }
+        self.video_queue_size = max(1, int(os.getenv('VIDEO_QUEUE_SIZE', str(self.video_batch_size))))
+        
+        # Texts longer than one model window are scored in overlapping windows
+        # (TEXT_LONG_MODE=false restores plain truncation to the first window)
+        self.text_long_mode = setting('TEXT_LONG_MODE').lower() == 'true'
+        self.text_max_windows = max(1, int(setting('TEXT_MAX_WINDOWS')))
+        self.text_window_batch_size = max(1, int(os.getenv('TEXT_WINDOW_BATCH_SIZE', '8')))
+        
+        # Incremental long-text scoring: documents split into content-defined
+        # segments whose scores are kept in a store of TEXT_SEGMENT_STORE_SIZE
+        # entries, so a resubmitted draft only re-runs the segments it changed
+        self.text_segment_store = None
+        if setting('TEXT_INCREMENTAL').lower() == 'true':
+            self.text_segment_store = SegmentStore(int(os.getenv('TEXT_SEGMENT_STORE_SIZE', '100000')))
+        
+        # Optional perceptual-hash index: images and video frames within
+        # PHASH_MAX_DISTANCE bits of one already scored reuse its verdict
+        self.phash_algorithm = setting('PHASH_ALGORITHM').lower()
+        if self.phash_algorithm not in phash.HASH_ALGORITHMS:
+            raise ValueError(f"PHASH_ALGORITHM must be one of {phash.HASH_ALGORITHMS}")
+        self.phash_index = None
+        if setting('PHASH_INDEX').lower() == 'true':
+            self.phash_index = phash.NearDuplicateIndex(
+                max_distance=int(setting('PHASH_MAX_DISTANCE')),
+                max_entries=int(os.getenv('PHASH_INDEX_SIZE', '1000000'))
+            )
+        
+        # Cheap-first cascade (CASCADE_STAGES, e.g. "metadata,linear"): stages
+        # run before the models, which only see what the stages leave open.
+        # "metadata" decides on generator markers in EXIF, XMP, C2PA and PNG
+        # text chunks (container tags for videos); "linear" scores cheap image
+        # or text features with the logistic models in CASCADE_MODEL_PATH and
+        # decides past CASCADE_LINEAR_AI or below CASCADE_LINEAR_HUMAN
+        self.cascade_stages = cascade_from_env()
+        self.cascade_models = {}
+        if "linear" in self.cascade_stages:
+            model_path = setting('CASCADE_MODEL_PATH')
+            if not model_path:
+                raise ValueError("CASCADE_STAGES includes linear but CASCADE_MODEL_PATH is not set")
+            self.cascade_models = load_linear_models(model_path)
+        self.cascade_linear_ai = float(setting('CASCADE_LINEAR_AI'))
+        self.cascade_linear_human = float(setting('CASCADE_LINEAR_HUMAN'))
         
         # Debug mode
         self.debug = os.getenv('DETECTOR_DEBUG', 'false').lower() == 'true'
+    
+    def __getattr__(self, name: str):
+        # Only called for attributes not set yet: load the model that owns them
+        for modality, attributes in MODEL_ATTRIBUTES.items():
+            if name in attributes and "_model_locks" in self.__dict__:
+                self.load_model(modality)
+                return self.__dict__[name]
+        raise AttributeError(f"'AIDetector' object has no attribute '{name}'")
+    
+    def load_model(self, modality: str, defer_warm_up: bool = False):
+        """Load one model (once; concurrent callers wait for the first) and optionally warm it up.
         
+        With ``defer_warm_up`` the model stops at "loaded"; a later call
+        warms it up. Preloading before fork uses this so no inference runs
+        in the parent process.
+        """
+        with self._model_locks[modality]:
+            state = self.model_state[modality]
+            if state == "ready" or (state == "loaded" and defer_warm_up):
+                return
+            try:
+                if state != "loaded":
+                    self.model_state[modality] = "loading"
+                    start = time.perf_counter()
+                    if modality == "image":
+                        self._load_image_model()
+                    else:
+                        self._load_text_model()
+                    self.model_load_seconds[modality] = round(time.perf_counter() - start, 2)
+                    self.model_state[modality] = "loaded"
+                if defer_warm_up:
+                    return
+                if self.warm_up:
+                    self._warm_up(modality)
+            except Exception:
+                self.model_state[modality] = "failed"
+                raise
+            self.model_state[modality] = "ready"
+    
+    def load_models(self, modalities: Optional[List[str]] = None, defer_warm_up: bool = False):
+        """Load the given models (default: the eager ones) concurrently."""
+        if modalities is None:
+            modalities = [m for m in MODALITIES if self.model_loading[m] == "eager"]
+        if not modalities:
+            return
+        with ThreadPoolExecutor(max_workers=len(modalities), thread_name_prefix="load-model") as executor:
+            futures = [executor.submit(self.load_model, modality, defer_warm_up) for modality in modalities]
+            for future in futures:
+                future.result()
+    
+    def readiness(self) -> dict:
+        """Whether every eager model is loaded (and warmed up), with per-model state."""
+        return {
+            "ready": all(
+                self.model_state[m] == "ready" for m in MODALITIES if self.model_loading[m] == "eager"
+            ),
+            "models": {
+                modality: {
+                    "state": self.model_state[modality],
+                    "loading": self.model_loading[modality],
+                    "load_seconds": self.model_load_seconds[modality],
+                }
+                for modality in MODALITIES
+            },
+        }
+    
+    def _load_image_model(self):
+        processor = AutoImageProcessor.from_pretrained(IMAGE_MODEL_ID)
+        model = AutoModelForImageClassification.from_pretrained(IMAGE_MODEL_ID).eval()
+        
+        # Inference backend (IMAGE_BACKEND, default INFERENCE_BACKEND): "torch"
+        # runs fp32 on the GPU if available, "int8" and "onnx" run on CPU
+        backend = backend_from_env("image")
+        device = backend_device(backend, self.device)
+        model = load_backend(
+            backend, model, IMAGE_MODEL_ID,
+            dict(processor(Image.new('RGB', (224, 224)), return_tensors="pt")),
+            device
+        )
+        
+        # Tensor preprocessing falls back to the processor for configs it does not mirror
+        image_pixels = None
+        if self.image_preprocess == "tensor":
+            image_pixels = TensorPreprocessor.from_processor(processor)
+            if image_pixels is None:
+                logger.info("Image processor %s not supported by tensor preprocessing; using it directly",
+                            type(processor).__name__)
+        
+        self.image_processor = processor
+        self.image_pixels = image_pixels
+        self.image_decode_size = decode_size(processor) if self.image_reduced_decode else None
+        self.image_backend = backend
+        self.image_device = device
+        self.image_labels = model.config.id2label
+        self.image_model = model
         if self.debug:
-            print(f"Image model labels: {self.image_labels}")
-            print(f"Text model labels: {self.text_labels}")
+            logger.debug("Image model labels: %s", self.image_labels)
+    
+    def _load_text_model(self):
+        tokenizer = AutoTokenizer.from_pretrained(TEXT_MODEL_ID)
+        model = AutoModelForSequenceClassification.from_pretrained(TEXT_MODEL_ID).eval()
+        
+        backend = backend_from_env("text")
+        device = backend_device(backend, self.device)
+        model = load_backend(
+            backend, model, TEXT_MODEL_ID,
+            dict(tokenizer(["example input", "a longer example input"], padding=True, return_tensors="pt")),
+            device
+        )
+        
+        # Long-text windows: tokens per window (model limit less special tokens) and overlap
+        max_length = tokenizer.model_max_length
+        if max_length > 100_000:
+            # Tokenizers without a configured limit report a huge sentinel
+            max_length = 512
+        self.text_window_tokens = max_length - tokenizer.num_special_tokens_to_add()
+        self.text_window_overlap = min(int(setting('TEXT_WINDOW_OVERLAP')), self.text_window_tokens - 1)
+        if self.text_segment_store is not None and not tokenizer.is_fast:
+            logger.info("Incremental text scoring needs a fast tokenizer; using sliding windows")
+        
+        self.text_tokenizer = tokenizer
+        self.text_backend = backend
+        self.text_device = device
+        self.text_labels = model.config.id2label
+        self.text_model = model
+        if self.debug:
+            logger.debug("Text model labels: %s", self.text_labels)
+    
+    def _warm_up(self, modality: str):
+        """One dummy forward pass so the first request does not pay for lazy kernel setup."""
+        with torch.no_grad():
+            if modality == "image":
+                self.image_model(**self._image_inputs([np.zeros((224, 224, 3), dtype=np.uint8)]))
+            else:
+                inputs = self.text_tokenizer(["warm up"], return_tensors="pt").to(self.text_device)
+                self.text_model(**inputs)
+    
+    def _classify(self, ai_prob: float) -> str:
+        """Map an AI probability onto the verdict thresholds."""
+        if ai_prob > AI_THRESHOLD:
+            return "Likely AI-Generated"
+        elif ai_prob < HUMAN_THRESHOLD:
+            return "Likely Human-Created"
+        return "Unclear / Mixed"
     
     def detect_image(self, image_path: str) -> Tuple[str, float, float, float]:
         """Detect if an image is AI-generated using the orion-ai/ai-image-detector model."""
         try:
-            # Load and preprocess image using PIL
-            image = Image.open(image_path).convert('RGB')
-            
-            # Use the model's feature extractor for proper preprocessing
-            # This ensures correct resizing, normalization, and tensor conversion
-            inputs = self.image_processor(image, return_tensors="pt").to(self.device)
-            
-            # Get prediction
-            with torch.no_grad():
-                outputs = self.image_model(**inputs)
-                logits = outputs.logits
-                
-                # Apply softmax to get probabilities
-                probs = F.softmax(logits, dim=-1)
-                
-                # Get probabilities for each class
-                ai_prob = probs[0][1].item()  # Assuming index 1 is AI-generated
-                real_prob = probs[0][0].item()  # Assuming index 0 is real
-                
-                # Debug logging
-                if self.debug:
-                    print(f"Image detection - Raw logits: {logits}")
-                    print(f"Image detection - Probabilities: {probs}")
-                    print(f"Image detection - AI prob: {ai_prob:.4f}, Real prob: {real_prob:.4f}")
-                    print(f"Image detection - Labels: {self.image_labels}")
-                    print(f"Image detection - Input shape: {inputs['pixel_values'].shape}")
-                
-                # Normalized confidence thresholds for clear classification
-                # If confidence > 0.7 → return "Likely AI-Generated"  
-                # If confidence < 0.3 → return "Likely Human-Created"  
-                # Otherwise (0.3–0.7) → return "Unclear / Mixed"
-                if ai_prob > 0.7:
-                    result = "Likely AI-Generated"
-                elif ai_prob < 0.3:
-                    result = "Likely Human-Created"
-                else:
-                    result = "Unclear / Mixed"
-                
-                # Return AI probability as confidence for transparency
-                confidence = ai_prob
-                
-                return result, confidence, ai_prob, real_prob
-                
+            return self.detect_images([image_path])[0]
         except Exception as e:
-            print(f"Error detecting image: {e}")
+            logger.warning("Error detecting image: %s", e)
             return "Unclear / Mixed", 0.0, 0.0, 0.0
+
+    def detect_images(self, image_paths: List[str]) -> List[Tuple[str, float, float, float]]:
+        """Detect if a batch of images is AI-generated with a single forward pass."""
+        # Images that fail to decode get the neutral fallback
+        return [
+            ("Unclear / Mixed", 0.0, 0.0, 0.0) if isinstance(detailed, Exception) else detailed[0]
+            for detailed in self.detect_images_indexed(image_paths)
+        ]
     
-    def detect_image_from_array(self, image_array: np.ndarray) -> Tuple[str, float, float, float]:
-        """Detect if an image array is AI-generated (for video frame processing)."""
-        try:
-            # Convert numpy array to PIL Image
-            image = Image.fromarray((image_array * 255).astype(np.uint8))
-            inputs = self.image_processor(image, return_tensors="pt").to(self.device)
-            
-            # Get prediction
-            with torch.no_grad():
-                outputs = self.image_model(**inputs)
-                logits = outputs.logits
-                
-                # Apply softmax to get probabilities
-                probs = F.softmax(logits, dim=-1)
-                
-                # Get probabilities for each class
-                ai_prob = probs[0][1].item()  # Assuming index 1 is AI-generated
-                real_prob = probs[0][0].item()  # Assuming index 0 is real
-                
-                # Debug logging
-                if self.debug:
-                    print(f"Array image detection - Raw logits: {logits}")
-                    print(f"Array image detection - Probabilities: {probs}")
-                    print(f"Array image detection - AI prob: {ai_prob:.4f}, Real prob: {real_prob:.4f}")
-                
-                # Normalized confidence thresholds for clear classification
-                # If confidence > 0.7 → return "Likely AI-Generated"  
-                # If confidence < 0.3 → return "Likely Human-Created"  
-                # Otherwise (0.3–0.7) → return "Unclear / Mixed"
-                if ai_prob > 0.7:
-                    result = "Likely AI-Generated"
-                elif ai_prob < 0.3:
-                    result = "Likely Human-Created"
+    def detect_images_indexed(self, image_paths: List[str]) -> List[Tuple[Tuple[str, float, float, float], Optional[Dict]]]:
+        """Detect a batch of images, reusing verdicts of near-duplicate images seen before.
+        
+        Images may be paths, open binary file objects (e.g. an upload's
+        spooled buffer) or already decoded RGB PIL images. Returns
+        (prediction, near_duplicate) per image, where near_duplicate is None
+        when the model ran, or {"distance": bits} when the verdict came from
+        the perceptual-hash index. An image that fails to decode gets its
+        exception in place of that pair.
+        """
+        results = [None] * len(image_paths)
+        
+        images, positions, hashes = [], [], []
+        for position, image_path in enumerate(image_paths):
+            try:
+                if isinstance(image_path, Image.Image):
+                    image = image_path
                 else:
-                    result = "Unclear / Mixed"
-                
-                # Return AI probability as confidence for transparency
-                confidence = ai_prob
-                
-                return result, confidence, ai_prob, real_prob
-                
-        except Exception as e:
-            print(f"Error detecting image from array: {e}")
-            return "Unclear / Mixed", 0.0, 0.0, 0.0
-    
-    def detect_video(self, video_path: str) -> Tuple[str, float, Dict]:
-        """Detect if a video contains AI-generated content by analyzing frames."""
-        try:
-            # Extract frames using ffmpeg - sample 1 fps up to 64 frames
-            frames_dir = tempfile.mkdtemp()
-            
-            # Get video info
-            probe = ffmpeg.probe(video_path)
-            duration = float(probe['streams'][0]['duration'])
-            
-            # Sample 1 fps, but limit to 64 frames maximum
-            frame_interval = max(1.0, duration / 64)
-            frame_times = np.arange(0, duration, frame_interval)
-            
-            frame_stats = []
-            ai_probs = []
-            quality_scores = []
+                    with span("decode"):
+                        image = open_image(image_path, self.image_decode_size, self.image_max_pixels)
+            except Exception as e:
+                logger.warning("Error detecting image: %s", e)
+                results[position] = e
+                continue
             
-            for i, time in enumerate(frame_times):
-                frame_path = os.path.join(frames_dir, f"frame_{i:04d}.jpg")
-                
-                # Extract frame at specific time with high quality
-                try:
-                    (
-                        ffmpeg
-                        .input(video_path, ss=time)
-                        .output(frame_path, vframes=1, q_v=1, pix_fmt='rgb24')
-                        .overwrite_output()
-                        .run(capture_stderr=True)
-                    )
-                    
-                    # Load frame directly as RGB (ffmpeg already outputs RGB)
-                    frame = cv2.imread(frame_path, cv2.IMREAD_COLOR)
-                    if frame is None:
-                        continue
-                    
-                    # Since ffmpeg outputs RGB24, we can use it directly
-                    # But cv2.imread converts it back to BGR, so we need to convert back to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Calculate quality score using Laplacian variance
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-                    quality_scores.append(laplacian_var)
-                    
-                    # Skip low-quality frames (blurry)
-                    if laplacian_var < 80:
-                        os.remove(frame_path)
-                        continue
-                    
-                    # Detect AI in frame using the RGB image
-                    # The detect_image_from_array method will handle proper preprocessing
-                    result, confidence, ai_prob, real_prob = self.detect_image_from_array(frame_rgb)
-                    
-                    # Store frame statistics
-                    frame_stats.append({
-                        "frame_number": i,
-                        "timestamp": time,
-                        "result": result,
-                        "confidence": confidence,
-                        "quality_score": laplacian_var
-                    })
-                    
-                    # Store AI probability directly
-                    ai_probs.append(confidence)
-                    
-                    # Clean up frame file
-                    os.remove(frame_path)
-                    
-                except Exception as e:
-                    print(f"Error processing frame at {time}s: {e}")
+            image_hash = None
+            if self.phash_index is not None:
+                with span("phash"):
+                    image_hash = phash.image_hash(image, self.phash_algorithm)
+                    match = self.phash_index.lookup(image_hash)
+                if match is not None:
+                    prediction, distance = match
+                    results[position] = (prediction, {"distance": distance})
                     continue
             
-            # Clean up frames directory
-            os.rmdir(frames_dir)
-            
-            if not ai_probs:
-                return "Unclear / Mixed", 0.0, {"frame_stats": frame_stats, "n_frames": 0, "pct_high": 0, "pct_low": 0}
-            
-            # Calculate robust statistics
-            ai_probs = np.array(ai_probs)
-            n_frames = len(ai_probs)
-            
-            # Trimmed mean (top 50% frames)
-            sorted_probs = np.sort(ai_probs)
-            trim_size = n_frames // 2
-            final_prob = np.mean(sorted_probs[-trim_size:])
-            
-            # Calculate percentage statistics using new thresholds
-            pct_high = np.sum(ai_probs > 0.7) / n_frames * 100
-            pct_low = np.sum(ai_probs < 0.3) / n_frames * 100
-            
-            # Enhanced verdict rules with normalized confidence thresholds
-            if final_prob > 0.7 and pct_high >= 70:
-                result = "Likely AI-Generated"
-            elif final_prob < 0.3 and pct_low >= 70:
-                result = "Likely Human-Created"
-            else:
-                result = "Unclear / Mixed"
+            images.append(image)
+            positions.append(position)
+            hashes.append(image_hash)
+        
+        if not images:
+            return results
+        
+        predictions = self._predict_images(images)
+        for position, image_hash, prediction in zip(positions, hashes, predictions):
+            results[position] = (prediction, None)
+            if image_hash is not None:
+                self.phash_index.add(image_hash, prediction)
+        
+        return results
+    
+    def _image_inputs(self, images: List[Union[Image.Image, np.ndarray]]) -> Dict[str, torch.Tensor]:
+        """Model inputs for PIL images or uint8 RGB arrays, on the image model's device."""
+        if self.image_pixels is not None:
+            return self.image_pixels(images, self.image_device)
+        
+        # Use the model's feature extractor for proper preprocessing
+        # This ensures correct resizing, normalization, and tensor conversion
+        images = [Image.fromarray(image) if isinstance(image, np.ndarray) else image for image in images]
+        return self.image_processor(images, return_tensors="pt").to(self.image_device)
+    
+    def _predict_images(self, images: List[Union[Image.Image, np.ndarray]]) -> List[Tuple[str, float, float, float]]:
+        """Run PIL images or uint8 RGB arrays through the image model in one forward pass."""
+        with span("preprocess"):
+            inputs = self._image_inputs(images)
+        return self._forward_images(inputs)
+    
+    def _forward_images(self, inputs: Dict[str, torch.Tensor]) -> List[Tuple[str, float, float, float]]:
+        """Predictions for preprocessed image inputs, from one forward pass."""
+        with span("forward"), torch.no_grad():
+            outputs = self.image_model(**inputs)
+            probs = F.softmax(outputs.logits, dim=-1).cpu()
+        
+        # Debug logging
+        if self.debug:
+            logger.debug("Image detection - Raw logits: %s", outputs.logits)
+            logger.debug("Image detection - Probabilities: %s", probs)
+            logger.debug("Image detection - Labels: %s", self.image_labels)
+            logger.debug("Image detection - Input shape: %s", inputs['pixel_values'].shape)
+        
+        # Index 0 is real, index 1 is AI-generated; AI probability doubles as confidence
+        return [
+            (self._classify(ai_prob), ai_prob, ai_prob, real_prob)
+            for real_prob, ai_prob in probs[:, :2].tolist()
+        ]
+    
+    def detect_images_from_arrays(self, image_arrays: List[np.ndarray]) -> List[Tuple[str, float, float, float]]:
+        """Detect if a batch of uint8 RGB arrays (e.g. video frames) is AI-generated with a single forward pass."""
+        return self._predict_images(image_arrays)
+    
+    def _score_frame_batch(self, batch: List[Tuple], frame_stats: List[Dict], ai_probs: List[float],
+                           on_frame: Optional[Callable[[Dict], None]] = None) -> int:
+        """Score buffered (index, timestamp, frame, quality, hash, prediction) tuples.
+        
+        Frames that already carry a prediction (near-duplicate index hits)
+        skip the model; the rest share one forward pass. ``on_frame`` is
+        called with each frame's statistics as soon as it is scored. Returns
+        the number of frames dropped because the forward pass failed.
+        """
+        if not batch:
+            return 0
+        
+        pending = [entry for entry in batch if entry[5] is None]
+        try:
+            predictions = self.detect_images_from_arrays([entry[2] for entry in pending]) if pending else []
+        except Exception:
+            logger.exception("Error processing frames at %ss-%ss", batch[0][1], batch[-1][1])
+            return len(batch)
+        self._record_frames(batch, predictions, frame_stats, ai_probs, on_frame)
+        return 0
+    
+    def _record_frames(self, batch: List[Tuple], predictions: List[Tuple], frame_stats: List[Dict],
+                       ai_probs: List[float], on_frame: Optional[Callable[[Dict], None]] = None):
+        """Add a scored batch to the frame statistics; ``predictions`` cover its frames without one."""
+        predictions = iter(predictions)
+        for i, timestamp, _, laplacian_var, frame_hash, prediction in batch:
+            near_duplicate = prediction is not None
+            if not near_duplicate:
+                prediction = next(predictions)
+                if frame_hash is not None:
+                    self.phash_index.add(frame_hash, prediction)
+            result, confidence, _, _ = prediction
             
-            # Enhanced frame statistics for transparency
-            enhanced_stats = {
-                "frame_stats": frame_stats,
-                "n_frames": n_frames,
-                "pct_high": round(pct_high, 1),
-                "pct_low": round(pct_low, 1),
-                "final_prob": round(final_prob, 4),
-                "quality_threshold": 80
+            # Store frame statistics
+            stats = {
+                "frame_number": i,
+                "timestamp": timestamp,
+                "result": result,
+                "confidence": confidence,
+                "quality_score": laplacian_var
             }
+            if near_duplicate:
+                stats["near_duplicate"] = True
+            frame_stats.append(stats)
+            if on_frame is not None:
+                on_frame(stats)
             
-            return result, final_prob, enhanced_stats
+            # Store AI probability directly
+            ai_probs.append(confidence)
+    
+    def _frame_quality(self, frame_rgb: np.ndarray) -> float:
+        """Sharpness of a frame: variance of its Laplacian (blurry frames score low)."""
+        with span("quality"):
+            gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+            return cv2.Laplacian(gray, cv2.CV_64F).var()
+    
+    def _frame_entry(self, i: int, timestamp: float, frame_rgb: np.ndarray, laplacian_var: float) -> Tuple:
+        """Batch entry for a frame that passed the quality filter, with any near-duplicate verdict."""
+        # Frames close to an already scored image or frame reuse its verdict
+        frame_hash = None
+        if self.phash_index is not None:
+            with span("phash"):
+                frame_hash = phash.image_hash(frame_rgb, self.phash_algorithm)
+                match = self.phash_index.lookup(frame_hash)
+            if match is not None:
+                return (i, timestamp, None, laplacian_var, frame_hash, match[0])
+        return (i, timestamp, frame_rgb, laplacian_var, frame_hash, None)
+    
+    def _score_video_serial(self, frames: Iterator[Tuple[int, float, np.ndarray]], frames_planned: int,
+                            frame_stats: List[Dict], ai_probs: List[float],
+                            on_frame: Optional[Callable[[Dict], None]] = None) -> Tuple[int, bool, int]:
+        """Decode, filter and score frames one after another; returns (frames evaluated, early exit, frames failed)."""
+        frames_evaluated = 0
+        frames_failed = 0
+        early_exit = False
+        # Early exit checks after every batch whether the frames left could
+        # still change the verdict, sizing batches to reach the first point
+        # where they no longer could
+        flush_size = self.video_batch_size
+        
+        # Frames that pass the quality filter are scored in batches
+        batch = []
+        batch_bytes = 0
+        
+        for i, timestamp, frame_rgb in timed_iter("decode", frames):
+            frames_evaluated += 1
+            try:
+                # Skip low-quality frames (blurry)
+                laplacian_var = self._frame_quality(frame_rgb)
+                if laplacian_var < QUALITY_THRESHOLD:
+                    continue
+            except Exception as e:
+                logger.warning("Error processing frame at %ss: %s", timestamp, e)
+                continue
             
-        except Exception as e:
-            print(f"Error detecting video: {e}")
-            return "Unclear / Mixed", 0.0, {}
+            entry = self._frame_entry(i, timestamp, frame_rgb, laplacian_var)
+            batch.append(entry)
+            if entry[2] is not None:
+                batch_bytes += frame_rgb.nbytes
+            
+            # Flush when the batch is full or holds too much decoded video
+            if len(batch) >= flush_size or batch_bytes >= self.video_batch_max_bytes:
+                frames_failed += self._score_frame_batch(batch, frame_stats, ai_probs, on_frame)
+                batch = []
+                batch_bytes = 0
+                
+                if self.video_early_exit:
+                    remaining = frames_planned - frames_evaluated
+                    if video_verdict_settled(ai_probs, remaining):
+                        early_exit = remaining > 0
+                        break
+                    flush_size = min(self.video_batch_size, frames_until_settled(ai_probs, remaining))
+        
+        # Stops the decoder when leaving early
+        frames.close()
+        frames_failed += self._score_frame_batch(batch, frame_stats, ai_probs, on_frame)
+        return frames_evaluated, early_exit, frames_failed
+    
+    def _score_video_pipelined(self, sources: List[Iterator[Tuple[int, float, np.ndarray]]], frames_planned: int,
+                               frame_stats: List[Dict], ai_probs: List[float],
+                               on_frame: Optional[Callable[[Dict], None]] = None) -> Tuple[int, bool, int, Dict]:
+        """Score frames with decode, quality filter, preprocessing and inference running concurrently.
+        
+        Each stage runs on its own threads (VIDEO_<STAGE>_WORKERS), joined by
+        queues of VIDEO_QUEUE_SIZE items, so decoding the next frames
+        overlaps the forward pass on the last batch. Batches take whatever
+        filtered frames are waiting, up to VIDEO_BATCH_SIZE. Returns (frames
+        evaluated, early exit, frames failed, per-stage utilization).
+        """
+        # Frames the quality filter dropped (list.append is atomic across stage threads)
+        rejected = []
+        
+        def quality(frame):
+            i, timestamp, frame_rgb = frame
+            try:
+                laplacian_var = self._frame_quality(frame_rgb)
+            except Exception as e:
+                logger.warning("Error processing frame at %ss: %s", timestamp, e)
+                laplacian_var = None
+            if laplacian_var is None or laplacian_var < QUALITY_THRESHOLD:
+                rejected.append(i)
+                return None
+            return self._frame_entry(i, timestamp, frame_rgb, laplacian_var)
+        
+        def preprocess(batch):
+            pending = [entry[2] for entry in batch if entry[5] is None]
+            try:
+                with span("preprocess"):
+                    return batch, self._image_inputs(pending) if pending else None
+            except Exception:
+                logger.exception("Error processing frames at %ss-%ss", batch[0][1], batch[-1][1])
+                return batch, False
+        
+        def inference(work):
+            batch, inputs = work
+            if inputs is False:
+                return batch, None
+            try:
+                return batch, self._forward_images(inputs) if inputs is not None else []
+            except Exception:
+                logger.exception("Error processing frames at %ss-%ss", batch[0][1], batch[-1][1])
+                return batch, None
+        
+        def frame_bytes(entry):
+            return entry[2].nbytes if entry[5] is None else 0
+        
+        workers = self.video_stage_workers
+        frame_pipeline = Pipeline(
+            [timed_iter("decode", source) for source in sources],
+            [
+                Stage("quality", quality, workers["quality"]),
+                Stage("preprocess", preprocess, workers["preprocess"], batch_size=self.video_batch_size,
+                      max_bytes=self.video_batch_max_bytes, sizeof=frame_bytes),
+                Stage("inference", inference, workers["inference"]),
+            ],
+            queue_size=self.video_queue_size
+        )
+        
+        resolved = 0
+        failed = 0
+        early_exit = False
+        outputs = iter(frame_pipeline)
+        try:
+            for batch, predictions in outputs:
+                # Frames of a failed batch count as evaluated, as in serial scoring
+                resolved += len(batch)
+                if predictions is None:
+                    failed += len(batch)
+                else:
+                    self._record_frames(batch, predictions, frame_stats, ai_probs, on_frame)
+                
+                if self.video_early_exit:
+                    # Frames still in the pipeline count as remaining
+                    remaining = frames_planned - resolved - len(rejected)
+                    if video_verdict_settled(ai_probs, remaining):
+                        early_exit = remaining > 0
+                        break
+        finally:
+            # Stops every stage and the decoders when leaving early
+            outputs.close()
+        
+        # Batches finish out of order; report frames in clip order
+        frame_stats.sort(key=lambda stats: stats["frame_number"])
+        return resolved + len(rejected), early_exit, failed, frame_pipeline.stats()
+    
+    def detect_video(self, video_path: str, on_frame: Optional[Callable[[Dict], None]] = None) -> Tuple[str, float, Dict]:
+        """Detect if a video contains AI-generated content by analyzing frames."""
+        frame_stats = []
+        ai_probs = []
+        
+        # Decode sampled frames as RGB arrays: 1 fps up to 64, or the
+        # frames adaptive sampling picked
+        with span("sample"):
+            info, grid_times, indices, sampling = plan_frames(
+                video_path, self.video_sampling, self.video_decode_mode,
+                min_frames=self.video_min_frames, min_distance=self.video_distinct_threshold
+            )
+        frames_planned = len(indices)
+        
+        pipeline_stats = None
+        if self.video_pipeline:
+            sources = split_planned(video_path, info, grid_times, indices, self.video_decode_mode,
+                                    coverage=self.video_early_exit, parts=self.video_stage_workers["decode"])
+            frames_evaluated, early_exit, frames_failed, pipeline_stats = self._score_video_pipelined(
+                sources, frames_planned, frame_stats, ai_probs, on_frame
+            )
+        else:
+            frames = iter_planned(video_path, info, grid_times, indices, self.video_decode_mode,
+                                  coverage=self.video_early_exit)
+            frames_evaluated, early_exit, frames_failed = self._score_video_serial(
+                frames, frames_planned, frame_stats, ai_probs, on_frame
+            )
+        frame_counts = {"frames_planned": frames_planned, "frames_evaluated": frames_evaluated, "early_exit": early_exit}
+        if pipeline_stats is not None:
+            frame_counts["pipeline"] = pipeline_stats
+        
+        if not ai_probs and frames_failed:
+            # Not a verdict: every frame that passed the filter failed to score
+            raise RuntimeError(f"No video frame could be scored ({frames_failed} failed)")
+        if not ai_probs:
+            return "Unclear / Mixed", 0.0, {"frame_stats": frame_stats, "n_frames": 0, "pct_high": 0, "pct_low": 0,
+                                            **frame_counts, **sampling}
+        
+        # Calculate robust statistics
+        n_frames = len(ai_probs)
+        result, final_prob, pct_high, pct_low = video_verdict(ai_probs)
+        
+        # Enhanced frame statistics for transparency
+        enhanced_stats = {
+            "frame_stats": frame_stats,
+            "n_frames": n_frames,
+            "pct_high": round(pct_high, 1),
+            "pct_low": round(pct_low, 1),
+            "final_prob": round(final_prob, 4),
+            "quality_threshold": QUALITY_THRESHOLD,
+            **frame_counts,
+            **sampling
+        }
+        
+        return result, final_prob, enhanced_stats
     
     def detect_text(self, text: str) -> Tuple[str, float, float, float]:
         """Detect if text is AI-generated using the roberta-base-openai-detector model."""
         try:
-            # Tokenize and run through model
+            prediction, _ = self.detect_text_windows(text)
+            return prediction
+        except Exception:
+            logger.exception("Error detecting text")
+            return "Unclear / Mixed", 0.0, 0.0, 0.0
+    
+    def detect_text_windows(self, text: str) -> Tuple[Tuple[str, float, float, float], Optional[List[Dict]]]:
+        """Detect text, scoring documents longer than one model window in overlapping windows.
+        
+        Returns (prediction, window_stats); window_stats is None when the text
+        fits in a single window.
+        """
+        if self._is_long_text(text):
+            return self._detect_long_text(text)
+        
+        # Tokenize and run through model
+        with span("preprocess"):
             inputs = self.text_tokenizer(
                 text, 
                 return_tensors="pt", 
                 truncation=True, 
                 padding=True
-            ).to(self.device)
+            ).to(self.text_device)
+        
+        with span("forward"), torch.no_grad():
+            outputs = self.text_model(**inputs)
             
-            with torch.no_grad():
+        logits = outputs.logits
+        probs = F.softmax(logits, dim=-1)[0].tolist()
+        
+        # HuggingFace order: [real_prob, fake_prob]
+        real_prob = probs[0]
+        ai_prob = probs[1]
+        
+        # Debug logging
+        if self.debug:
+            logger.debug("Text detection - Raw logits: %s", logits)
+            logger.debug("Text detection - Probabilities: %s", probs)
+            logger.debug("Text detection - AI prob: %.4f, Real prob: %.4f", ai_prob, real_prob)
+            logger.debug("Text detection - Labels: %s", self.text_labels)
+        
+        # Normalized confidence thresholds for clear classification
+        result = self._classify(ai_prob)
+        
+        # Return AI probability as confidence for transparency
+        confidence = ai_prob
+        
+        return (result, confidence, ai_prob, real_prob), None
+    
+    def detect_texts(self, texts: List[str]) -> List[Tuple[str, float, float, float]]:
+        """Detect if a batch of texts is AI-generated with a single padded forward pass."""
+        return [prediction for prediction, _ in self.detect_texts_windows(texts)]
+    
+    def detect_texts_windows(self, texts: List[str]) -> List[Tuple[Tuple[str, float, float, float], Optional[List[Dict]]]]:
+        """Detect a batch of texts, returning (prediction, window_stats) per text.
+        
+        Texts that fit in one window share a single padded forward pass; longer
+        ones are scored in sliding windows of their own.
+        """
+        results = [None] * len(texts)
+        
+        short_positions = []
+        for position, text in enumerate(texts):
+            if self._is_long_text(text):
+                results[position] = self._detect_long_text(text)
+            else:
+                short_positions.append(position)
+        
+        if short_positions:
+            with span("preprocess"):
+                inputs = self.text_tokenizer(
+                    [texts[position] for position in short_positions], 
+                    return_tensors="pt", 
+                    truncation=True, 
+                    padding=True
+                ).to(self.text_device)
+            
+            with span("forward"), torch.no_grad():
                 outputs = self.text_model(**inputs)
-                
-            logits = outputs.logits
-            probs = F.softmax(logits, dim=-1)[0].tolist()
             
             # HuggingFace order: [real_prob, fake_prob]
-            real_prob = probs[0]
-            ai_prob = probs[1]
+            probs = F.softmax(outputs.logits, dim=-1).cpu()
             
-            # Debug logging
             if self.debug:
-                print(f"Text detection - Raw logits: {logits}")
-                print(f"Text detection - Probabilities: {probs}")
-                print(f"Text detection - AI prob: {ai_prob:.4f}, Real prob: {real_prob:.4f}")
-                print(f"Text detection - Labels: {self.text_labels}")
+                logger.debug("Batch text detection - Input shape: %s", inputs['input_ids'].shape)
+                logger.debug("Batch text detection - Probabilities: %s", probs)
             
-            # Normalized confidence thresholds for clear classification
-            if ai_prob > 0.7:
-                result = "Likely AI-Generated"
-            elif ai_prob < 0.3:
-                result = "Likely Human-Created"
-            else:
-                result = "Unclear / Mixed"
+            for position, (real_prob, ai_prob) in zip(short_positions, probs[:, :2].tolist()):
+                results[position] = ((self._classify(ai_prob), ai_prob, ai_prob, real_prob), None)
+        
+        return results
+    
+    def _is_long_text(self, text: str) -> bool:
+        """Whether long-document mode applies to text."""
+        if not self.text_long_mode:
+            return False
+        # The byte-level BPE and WordPiece tokenizers used here never produce
+        # more tokens than the text has UTF-8 bytes, so most texts are known
+        # to fit in one window without tokenizing them twice
+        if len(text.encode("utf-8")) <= self.text_window_tokens:
+            return False
+        with span("preprocess"):
+            n_tokens = len(self.text_tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+        return n_tokens > self.text_window_tokens
+    
+    def _detect_long_text(self, text: str) -> Tuple[Tuple[str, float, float, float], List[Dict]]:
+        """Score overlapping token windows in padded batches and aggregate a document verdict.
+        
+        Past TEXT_MAX_WINDOWS, windows are picked evenly across the document
+        (always including the first and last) to keep latency predictable.
+        """
+        if self.text_segment_store is not None and self.text_tokenizer.is_fast:
+            return self._detect_segmented_text(text)
+        
+        # The tokenizer splits the text into windows that overlap by
+        # TEXT_WINDOW_OVERLAP tokens, each wrapped in the model's special tokens
+        with span("preprocess"):
+            inputs = self.text_tokenizer(
+                text,
+                return_tensors="pt",
+                truncation=True,
+                max_length=self.text_window_tokens + self.text_tokenizer.num_special_tokens_to_add(),
+                stride=self.text_window_overlap,
+                return_overflowing_tokens=True,
+                padding=True
+            )
+        n_windows = inputs["input_ids"].shape[0]
+        
+        picks = list(range(n_windows))
+        if n_windows > self.text_max_windows:
+            picks = np.unique(np.linspace(0, n_windows - 1, self.text_max_windows).round().astype(int)).tolist()
+        
+        window_probs = []
+        for start in range(0, len(picks), self.text_window_batch_size):
+            rows = picks[start:start + self.text_window_batch_size]
+            batch = {
+                key: inputs[key][rows].to(self.text_device)
+                for key in ("input_ids", "attention_mask")
+            }
             
-            # Return AI probability as confidence for transparency
-            confidence = ai_prob
+            with span("forward"), torch.no_grad():
+                outputs = self.text_model(**batch)
             
-            return result, confidence, ai_prob, real_prob
+            # HuggingFace order: [real_prob, fake_prob]
+            window_probs.extend(F.softmax(outputs.logits, dim=-1)[:, :2].cpu().tolist())
+        
+        stride = self.text_window_tokens - self.text_window_overlap
+        window_stats = [
+            {
+                "window": row,
+                "start_token": row * stride,
+                "end_token": row * stride + int(inputs["attention_mask"][row].sum()) - self.text_tokenizer.num_special_tokens_to_add(),
+                "result": self._classify(ai_prob),
+                "confidence": ai_prob
+            }
+            for row, (_, ai_prob) in zip(picks, window_probs)
+        ]
+        
+        # Document verdict: mean over windows
+        ai_prob = float(np.mean([ai for _, ai in window_probs]))
+        real_prob = float(np.mean([real for real, _ in window_probs]))
+        
+        if self.debug:
+            logger.debug("Long text detection - %d windows, %d scored, AI prob: %.4f", n_windows, len(picks), ai_prob)
+        
+        return (self._classify(ai_prob), ai_prob, ai_prob, real_prob), window_stats
+    
+    def _detect_segmented_text(self, text: str) -> Tuple[Tuple[str, float, float, float], List[Dict]]:
+        """Score a long document segment by segment, reusing stored scores of unchanged segments.
+        
+        Segments follow sentence boundaries and content-defined cut points
+        (see segments.plan_segments), so an edit changes the text of only the
+        segments around it; the rest are looked up by content hash. The
+        document verdict is the token-weighted mean over segments. Past
+        TEXT_MAX_WINDOWS, the segments with the lowest hashes are scored: a
+        sample that stays put as the draft is edited.
+        """
+        with span("preprocess"):
+            encoding = self.text_tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+            )
+            token_starts = [start for start, _ in encoding["offset_mapping"]]
+            segments = plan_segments(
+                text, token_starts, self.text_window_tokens, self.text_window_tokens // 8
+            )
+        keys = [segment_key(text[start:end].strip()) for start, end, _, _ in segments]
+        
+        picks = list(range(len(segments)))
+        if len(segments) > self.text_max_windows:
+            picks = sorted(sorted(picks, key=lambda row: keys[row])[:self.text_max_windows])
+        
+        scores = {row: self.text_segment_store.get(keys[row]) for row in picks}
+        missing = [row for row in picks if scores[row] is None]
+        for start in range(0, len(missing), self.text_window_batch_size):
+            rows = missing[start:start + self.text_window_batch_size]
+            with span("preprocess"):
+                inputs = self.text_tokenizer(
+                    [text[segments[row][0]:segments[row][1]].strip() for row in rows],
+                    return_tensors="pt",
+                    truncation=True,
+                    padding=True
+                ).to(self.text_device)
+            
+            with span("forward"), torch.no_grad():
+                outputs = self.text_model(**inputs)
+            
+            # HuggingFace order: [real_prob, fake_prob]
+            for row, (real_prob, ai_prob) in zip(rows, F.softmax(outputs.logits, dim=-1)[:, :2].cpu().tolist()):
+                scores[row] = (real_prob, ai_prob)
+                self.text_segment_store.set(keys[row], scores[row])
+        
+        window_stats = [
+            {
+                "window": row,
+                "start_token": segments[row][2],
+                "end_token": segments[row][3],
+                "result": self._classify(scores[row][1]),
+                "confidence": scores[row][1],
+                "reused": row not in missing
+            }
+            for row in picks
+        ]
+        
+        # Document verdict: mean over segments, weighted by their token counts
+        weights = [max(1, segments[row][3] - segments[row][2]) for row in picks]
+        ai_prob = float(np.average([scores[row][1] for row in picks], weights=weights))
+        real_prob = float(np.average([scores[row][0] for row in picks], weights=weights))
+        
+        if self.debug:
+            logger.debug("Segmented text detection - %d segments, %d scored, %d rescored, AI prob: %.4f",
+                         len(segments), len(picks), len(missing), ai_prob)
+        
+        return (self._classify(ai_prob), ai_prob, ai_prob, real_prob), window_stats
+    
+    def _cascade(self, content_type: str, item) -> Tuple[Optional[Tuple[Tuple[str, float, float, float], Dict]], object]:
+        """Run the cheap cascade stages on one image, video or text.
+        
+        Returns (decision, item). decision is (prediction, response fields)
+        when a stage settled the item, else None; item is what the model
+        should score instead: for an image the linear stage decoded, the
+        decoded image. A stage that fails is skipped.
+        """
+        for stage in self.cascade_stages:
+            try:
+                if stage == "metadata" and content_type in ("image", "video"):
+                    with span("metadata"):
+                        provenance = image_provenance(item) if content_type == "image" else video_provenance(item)
+                    if provenance:
+                        # A generator's own signature: no model score needed
+                        return ((self._classify(1.0), 1.0, 1.0, 0.0),
+                                {"decided_by": "metadata", "provenance": provenance}), item
                 
-        except Exception as e:
-            print(f"Error detecting text: {e}")
-            return "Unclear / Mixed", 0.0, 0.0, 0.0
+                elif stage == "linear" and content_type in self.cascade_models:
+                    if content_type == "image":
+                        with span("decode"):
+                            item = open_image(item, self.image_decode_size, self.image_max_pixels)
+                    with span("linear"):
+                        features = image_features(item) if content_type == "image" else text_features(item)
+                        ai_prob = self.cascade_models[content_type].predict(features)
+                    if ai_prob >= self.cascade_linear_ai or ai_prob <= self.cascade_linear_human:
+                        return ((self._classify(ai_prob), ai_prob, ai_prob, 1.0 - ai_prob),
+                                {"decided_by": "linear"}), item
+            except Exception as e:
+                logger.warning("Cascade stage %s failed: %s", stage, e, extra={"content_type": content_type})
+        return None, item
+    
+    def detect(self, content_type: str, content_path: str = None, text: str = None,
+               on_frame: Optional[Callable[[Dict], None]] = None) -> dict:
+        """Main detection method that routes to appropriate detector.
+        
+        The response carries a ``timings`` entry with the time spent in each
+        stage (decode, preprocess, forward, ...); the API records it as
+        metrics and strips it unless the client asked for it.
+        """
+        start = time.perf_counter()
+        with collect_spans() as spans:
+            response = self._detect(content_type, content_path, text, on_frame)
+        response["timings"] = stage_timings(spans, time.perf_counter() - start)
+        return response
     
-    def detect(self, content_type: str, content_path: str = None, text: str = None) -> dict:
-        """Main detection method that routes to appropriate detector."""
+    def _detect(self, content_type: str, content_path: Optional[str], text: Optional[str],
+                on_frame: Optional[Callable[[Dict], None]]) -> dict:
         checked_at = datetime.utcnow().isoformat() + "Z"
         
         try:
+            near_duplicate = None
+            window_stats = None
+            
+            # Cheap stages first; the models only run on what they leave open
+            item = text if content_type == "text" else content_path
+            if self.cascade_stages and item and content_type in ("image", "video", "text"):
+                decision, item = self._cascade(content_type, item)
+                if decision is not None:
+                    prediction, fields = decision
+                    return {**self._build_response(content_type, checked_at, *prediction), **fields}
+            
             if content_type == "image":
                 if not content_path:
                     raise ValueError("Image path required for image detection")
-                result, confidence, ai_prob, real_prob = self.detect_image(content_path)
+                detailed = self.detect_images_indexed([item])[0]
+                if isinstance(detailed, Exception):
+                    return self._image_error_response(checked_at, detailed)
+                prediction, near_duplicate = detailed
+                result, confidence, ai_prob, real_prob = prediction
                 frame_stats = None
                 
             elif content_type == "video":
                 if not content_path:
                     raise ValueError("Video path required for video detection")
-                result, confidence, frame_stats = self.detect_video(content_path)
+                result, confidence, frame_stats = self.detect_video(content_path, on_frame)
                 # For video, we'll use the final_prob as ai_prob and calculate real_prob
                 ai_prob = confidence
                 real_prob = 1.0 - confidence
@@ -324,32 +1051,136 @@ class AIDetector:
             elif content_type == "text":
                 if not text:
                     raise ValueError("Text content required for text detection")
-                result, confidence, ai_prob, real_prob = self.detect_text(text)
+                prediction, window_stats = self.detect_text_windows(item)
+                result, confidence, ai_prob, real_prob = prediction
                 frame_stats = None
                 
             else:
                 raise ValueError(f"Unsupported content type: {content_type}")
             
-            response = {
-                "type": content_type,
-                "result": result,
-                "confidence": round(confidence, 2),
-                "ai_prob": round(ai_prob, 2),
-                "real_prob": round(real_prob, 2),
-                "checked_at": checked_at
-            }
-            
-            # Add frame statistics for video
-            if frame_stats:
-                response["frame_stats"] = frame_stats
-            
+            response = self._build_response(
+                content_type, checked_at, result, confidence, ai_prob, real_prob, frame_stats
+            )
+            if near_duplicate:
+                response["near_duplicate"] = near_duplicate
+            if window_stats:
+                response["window_stats"] = window_stats
+            if self.cascade_stages:
+                response["decided_by"] = "near_duplicate" if near_duplicate else "model"
             return response
             
+        except Exception:
+            logger.exception("Detection error", extra={"content_type": content_type})
+            return self._error_response(content_type, checked_at)
+    
+    def detect_batch(self, content_type: str, items: List[str]) -> List[dict]:
+        """Detect a batch of image paths or texts, returning one response per item.
+        
+        Images and texts share a single forward pass; if the batch fails as a
+        whole, every item is retried on its own so one bad input cannot fail
+        the others. Each response carries ``timings`` as in detect.
+        """
+        if content_type not in ("image", "text"):
+            raise ValueError(f"Unsupported batch content type: {content_type}")
+        
+        start = time.perf_counter()
+        with collect_spans() as spans:
+            responses = self._detect_batch(content_type, items)
+        
+        # Stage times are shared out across the batch; per-item retries carry their own
+        timings = stage_timings(spans, time.perf_counter() - start, len(items))
+        for response in responses:
+            response.setdefault("timings", timings)
+        return responses
+    
+    def _detect_batch(self, content_type: str, items: List[str]) -> List[dict]:
+        checked_at = datetime.utcnow().isoformat() + "Z"
+        responses = [None] * len(items)
+        
+        # Cheap stages first; only the items they leave open share the forward pass
+        pending, inputs = [], []
+        for position, item in enumerate(items):
+            decision = None
+            if self.cascade_stages:
+                decision, item = self._cascade(content_type, item)
+            if decision is not None:
+                prediction, fields = decision
+                responses[position] = {**self._build_response(content_type, checked_at, *prediction), **fields}
+            else:
+                pending.append(position)
+                inputs.append(item)
+        if not pending:
+            return responses
+        
+        try:
+            if content_type == "image":
+                detailed = self.detect_images_indexed(inputs)
+            else:
+                detailed = self.detect_texts_windows(inputs)
         except Exception as e:
-            print(f"Detection error: {e}")
-            return {
-                "type": content_type,
-                "result": "Unclear / Mixed",
-                "confidence": 0.0,
-                "checked_at": checked_at
-            }
+            logger.warning("Batch detection error, falling back to per-item detection: %s", e, extra={"content_type": content_type, "items": len(items)})
+            for position in pending:
+                if content_type == "image":
+                    responses[position] = self.detect("image", content_path=items[position])
+                else:
+                    responses[position] = self.detect(content_type, text=items[position])
+            return responses
+        
+        # Images carry near-duplicate matches, long texts their window stats
+        detail_key = "near_duplicate" if content_type == "image" else "window_stats"
+        
+        for position, item_detailed in zip(pending, detailed):
+            if isinstance(item_detailed, Exception):
+                responses[position] = self._image_error_response(checked_at, item_detailed)
+                continue
+            prediction, detail = item_detailed
+            response = self._build_response(content_type, checked_at, *prediction)
+            if detail:
+                response[detail_key] = detail
+            if self.cascade_stages:
+                response["decided_by"] = "near_duplicate" if detail and content_type == "image" else "model"
+            responses[position] = response
+        return responses
+    
+    def _build_response(self, content_type: str, checked_at: str, result: str, confidence: float,
+                        ai_prob: float, real_prob: float, frame_stats: Dict = None) -> dict:
+        """Shape a detection result into the API response."""
+        response = {
+            "type": content_type,
+            "result": result,
+            "confidence": round(confidence, 2),
+            "ai_prob": round(ai_prob, 2),
+            "real_prob": round(real_prob, 2),
+            "checked_at": checked_at
+        }
+        
+        # Add frame statistics for video
+        if frame_stats:
+            response["frame_stats"] = frame_stats
+        
+        return response
+    
+    def _error_response(self, content_type: str, checked_at: str, error: str = "Detection failed") -> dict:
+        """Response returned when detection fails.
+        
+        Its ``error`` says why and marks it as a failure rather than a
+        verdict: it is not cached, and batch and scan results report it as failed.
+        """
+        return {
+            "type": content_type,
+            "result": "Unclear / Mixed",
+            "confidence": 0.0,
+            "checked_at": checked_at,
+            "error": error
+        }
+    
+    def _image_error_response(self, checked_at: str, error: Exception) -> dict:
+        """Response for an image that failed to decode.
+        
+        An image over the pixel budget (IMAGE_MAX_PIXELS, or Pillow's
+        decompression bomb limit) is rejected rather than failed: its
+        ``status_code`` 413 is what the API answers /detect with.
+        """
+        if isinstance(error, (ImageTooLarge, Image.DecompressionBombError)):
+            return {**self._error_response("image", checked_at, str(error)), "status_code": 413}
+        return self._error_response("image", checked_at, "Could not decode image")
@@ -0,0 +1,29 @@
+"""
+Multi-worker serving with shared model weights:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+With preload_app the master process imports main and loads the eager
+models once (PRELOAD_MODELS); each forked worker shares those weights
+copy-on-write instead of loading its own copy, so adding workers adds
+HTTP concurrency without multiplying model memory.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Long videos can keep a request busy for minutes
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+
+preload_app = os.getenv('PRELOAD_MODELS', 'true').lower() == 'true'
+os.environ['PRELOAD_MODELS'] = 'true' if preload_app else 'false'
+
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauges from the merged /metrics (PROMETHEUS_MULTIPROC_DIR)."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
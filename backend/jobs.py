@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+class JobStoreFullError(Exception):
+    """Raised when too many jobs are active or the store cannot evict a finished one."""
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.utcfromtimestamp(timestamp).isoformat() + "Z"
+
+
+class Job:
+    """One background detection: its state, the frames scored so far and the final response.
+
+    Its status goes queued -> running -> done | failed.
+
+    All methods must be called on the event loop; worker threads hand
+    frames over with ``loop.call_soon_threadsafe(job.add_frame, stats)``.
+    """
+
+    def __init__(self, content_type: str):
+        self.id = uuid.uuid4().hex
+        self.content_type = content_type
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.frames: List[dict] = []
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def start(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self._notify()
+
+    def add_frame(self, stats: dict):
+        self.frames.append(stats)
+        self._notify()
+
+    def finish(self, result: dict):
+        self.result = result
+        self._end("done")
+
+    def fail(self, error: str):
+        self.error = error
+        self._end("failed")
+
+    def _end(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event and arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def events(self, start: int = 0) -> AsyncIterator[Tuple[int, str, dict]]:
+        """Yield (index, kind, data) for each frame from ``start``, then the final result or error."""
+        cursor = max(0, start)
+        while True:
+            while cursor < len(self.frames):
+                yield cursor, "frame", self.frames[cursor]
+                cursor += 1
+            if self.finished:
+                if self.status == "done":
+                    yield cursor, "result", self.result
+                else:
+                    yield cursor, "error", {"error": self.error}
+                return
+            await self._changed.wait()
+
+    def to_dict(self) -> dict:
+        """Status payload for polling clients."""
+        payload = {
+            "job_id": self.id,
+            "type": self.content_type,
+            "status": self.status,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "frames_processed": len(self.frames),
+        }
+        if self.status == "done":
+            payload["result"] = self.result
+        elif self.status == "failed":
+            payload["error"] = self.error
+        return payload
+
+
+class JobStore:
+    """Bounded in-memory registry of background jobs.
+
+    At most ``max_active`` jobs may be queued or running at once. Finished
+    jobs stay readable for ``ttl_seconds`` after they end; once the store
+    holds ``max_jobs`` entries the oldest finished job is evicted to make
+    room. Active jobs are never evicted.
+    """
+
+    def __init__(self, max_jobs: int = 1000, max_active: int = 16, ttl_seconds: float = 3600):
+        self.max_jobs = max(1, max_jobs)
+        self.max_active = max(1, max_active)
+        self.ttl = ttl_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+        self.created = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def create(self, content_type: str) -> Job:
+        """Register a new queued job, or raise JobStoreFullError."""
+        self._prune()
+
+        if self.active() >= self.max_active:
+            self.rejected += 1
+            raise JobStoreFullError("Too many jobs in progress")
+
+        if len(self._jobs) >= self.max_jobs:
+            oldest_finished = next((job_id for job_id, job in self._jobs.items() if job.finished), None)
+            if oldest_finished is None:
+                self.rejected += 1
+                raise JobStoreFullError("Job store is full")
+            del self._jobs[oldest_finished]
+            self.expired += 1
+
+        job = Job(content_type)
+        self._jobs[job.id] = job
+        self.created += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def active(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def stats(self) -> dict:
+        self._prune()
+        return {
+            "jobs": len(self._jobs),
+            "active": self.active(),
+            "max_active": self.max_active,
+            "created": self.created,
+            "expired": self.expired,
+            "rejected": self.rejected,
+        }
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+            self.expired += 1
@@ -1,11 +1,29 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import json
+import logging
 import os
-import tempfile
-from typing import Optional
-import mimetypes
-from detectors import AIDetector
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Optional, Tuple
+from cache import ResultCache, content_key, text_digest
+from config import config_fingerprint, get_content_type
+from jobs import Job, JobStore, JobStoreFullError
+from scheduler import MicroBatcher
+from telemetry import (
+    REQUEST_SECONDS, ServiceCollector, configure_logging, observe_detection, register_service_collector,
+    render_metrics, stopwatch
+)
+from uploads import BodySizeLimitMiddleware, UploadTooLarge, copy_upload, digest_upload, spooled_path
+from workers import AdmissionController, DetectionPool, PoolUnavailableError, QueueFullError, limits_from_env
+
+# Text or JSON-lines logs (LOG_FORMAT), at LOG_LEVEL
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -14,7 +32,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Add CORS middleware
+# Upload limits: per file, and per /detect/batch request
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(100 * 1024 * 1024)))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '256'))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(200 * 1024 * 1024)))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '32'))
+
+# Bodies are counted as they stream in and cut off with 413 past these
+# limits; single uploads get 1MB of headroom for the form encoding and text
+upload_limit = MAX_FILE_SIZE + 1024 * 1024
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/detect": upload_limit, "/jobs": upload_limit, "/detect/batch": BATCH_MAX_BYTES}
+)
+
+# Add CORS middleware. Added last so it is outermost and its headers also
+# reach the 413s the size limit answers with on its own
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, restrict this to your frontend domain
@@ -23,46 +56,169 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI detector
-detector = AIDetector()
+# Detection runs on a worker pool (WORKER_POOL=thread|process) so the event
+# loop keeps serving /health and other requests during long analyses
+pool = DetectionPool(
+    kind=os.getenv('WORKER_POOL', 'thread').lower(),
+    workers=int(os.getenv('WORKER_POOL_SIZE', '4'))
+)
 
-def get_content_type(filename: str) -> str:
-    """Determine content type based on file extension."""
-    if not filename:
-        return "unknown"
-    
-    # Get MIME type
-    mime_type, _ = mimetypes.guess_type(filename)
+# With PRELOAD_MODELS=true (set by gunicorn.conf.py when preload_app is on)
+# the eager models load here, in the server's master process, so the
+# workers it forks share one copy of the weights
+if os.getenv('PRELOAD_MODELS', 'false').lower() == 'true':
+    pool.preload()
+
+# Per content type caps on running and waiting jobs; past them we answer 429
+admission = AdmissionController(limits_from_env())
+
+# Concurrent image and text requests are grouped into micro-batches that
+# share one forward pass; a batch runs once it is full or its oldest request
+# has waited BATCH_MAX_WAIT_MS
+batch_max_wait_ms = float(os.getenv('BATCH_MAX_WAIT_MS', '10'))
+image_batcher = MicroBatcher(
+    pool.batch_fn("image"),
+    max_batch_size=int(os.getenv('IMAGE_BATCH_MAX_SIZE', '8')),
+    max_wait_ms=batch_max_wait_ms,
+    executor=pool.executor
+)
+text_batcher = MicroBatcher(
+    pool.batch_fn("text"),
+    max_batch_size=int(os.getenv('TEXT_BATCH_MAX_SIZE', '16')),
+    max_wait_ms=batch_max_wait_ms,
+    executor=pool.executor
+)
+
+# Results are cached by content hash: an in-memory LRU, plus a SQLite tier
+# that survives restarts when DETECT_CACHE_DB is set
+result_cache = ResultCache(
+    max_entries=int(os.getenv('DETECT_CACHE_SIZE', '4096')),
+    ttl_seconds=float(os.getenv('DETECT_CACHE_TTL', '86400')),
+    db_path=os.getenv('DETECT_CACHE_DB') or None
+)
+fingerprint = config_fingerprint()
+
+# Background jobs (POST /jobs) for analyses that outlast a request timeout;
+# finished jobs stay readable for JOB_TTL seconds
+job_store = JobStore(
+    max_jobs=int(os.getenv('JOB_MAX_STORED', '1000')),
+    max_active=int(os.getenv('JOB_MAX_ACTIVE', '16')),
+    ttl_seconds=float(os.getenv('JOB_TTL', '3600'))
+)
+# Strong references so running job tasks are not garbage collected
+job_tasks = set()
+
+# GET /metrics: request and stage histograms, plus queue, cache and model
+# state read from the objects above at scrape time
+register_service_collector(ServiceCollector(
+    pool, admission, {"image": image_batcher, "text": text_batcher}, result_cache, job_store
+))
+
+@asynccontextmanager
+async def admitted(content_type: str, reject_when_full: bool = True):
+    """Hold an admission slot for a job, answering 429/503 when the service is saturated."""
+    try:
+        async with admission.admit(content_type, reject_when_full=reject_when_full):
+            yield
     
-    if mime_type:
-        if mime_type.startswith('image/'):
-            return "image"
-        elif mime_type.startswith('video/'):
-            return "video"
+    except QueueFullError:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many {content_type} requests in progress. Please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except (PoolUnavailableError, BrokenProcessPool):
+        raise HTTPException(
+            status_code=503,
+            detail="Detection workers are unavailable. Please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+async def run_detection(content_type: str, content_path: str = None, text: str = None) -> dict:
+    """Admit a detection job and run it on the worker pool."""
+    async with admitted(content_type):
+        if content_type == "image":
+            return await image_batcher.submit(content_path)
+        elif content_type == "text":
+            return await text_batcher.submit(text)
+        return await pool.detect(content_type, content_path=content_path)
+
+async def run_batch_detection(content_type: str, items: List[str]) -> List[dict]:
+    """Admit a whole batch of image paths or texts as one job and detect them together."""
+    async with admitted(content_type):
+        return await pool.run(partial(pool.batch_fn(content_type), items))
+
+async def timed_detection(content_type: str, breakdown: dict, content_path: str = None, text: str = None) -> dict:
+    """Run a detection, record its stage metrics and add its part to a request's timing breakdown."""
+    start = time.perf_counter()
+    result = await run_detection(content_type, content_path=content_path, text=text)
+    elapsed_ms = (time.perf_counter() - start) * 1000
     
-    # Fallback to file extension
-    ext = filename.lower().split('.')[-1] if '.' in filename else ''
+    timings = observe_detection(content_type, result)
+    if timings:
+        # Whatever the detector did not spend is admission and micro-batch waiting
+        breakdown["queue_ms"] = round(max(0.0, elapsed_ms - timings["detector_ms"]), 2)
+        breakdown.update(timings)
+    return result
+
+def timed_response(content: dict, breakdown: Optional[dict], started: float) -> JSONResponse:
+    """JSON response, with the request's timing breakdown when one was asked for."""
+    if breakdown is not None:
+        content = {**content, "timings": {**breakdown, "total_ms": round((time.perf_counter() - started) * 1000, 2)}}
+    return JSONResponse(content=content)
+
+def upload_suffix(filename: str) -> str:
+    return f".{filename.split('.')[-1]}"
+
+async def stage_upload(file: UploadFile, content_type: str) -> Tuple[object, str, int, Optional[str]]:
+    """Hash an upload and hand the detector something to read it from.
     
-    image_extensions = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff'}
-    video_extensions = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv', 'm4v'}
+    With thread workers, images decode straight from the upload's spooled
+    buffer. Videos, and images bound for worker processes, are read by path
+    from the spool file itself where the platform allows it, and otherwise
+    streamed to a temporary file in chunks. Either way the upload is never
+    held in memory as a whole. Returns (source, digest, size, temp_path or None).
+    """
+    digest, size = await asyncio.to_thread(digest_upload, file.file, MAX_FILE_SIZE)
+    if content_type == "image" and pool.kind == "thread":
+        return file.file, digest, size, None
     
-    if ext in image_extensions:
-        return "image"
-    elif ext in video_extensions:
-        return "video"
+    path = spooled_path(file.file)
+    if path is not None:
+        return path, digest, size, None
     
-    return "unknown"
+    path, digest, size = await asyncio.to_thread(copy_upload, file.file, upload_suffix(file.filename), MAX_FILE_SIZE)
+    return path, digest, size, path
+
+def raise_rejection(result: dict):
+    """Answer with the status a detector rejected its input with (413 for an image over IMAGE_MAX_PIXELS)."""
+    if "status_code" in result:
+        raise HTTPException(status_code=result["status_code"], detail=result["error"])
+
+def cache_result(cache_key: str, result: dict):
+    """Cache a detection result unless detection failed."""
+    # Failed detections carry an error and are worth retrying
+    if "error" not in result:
+        result_cache.set(cache_key, result)
 
 @app.post("/detect")
 async def detect_content(
     file: Optional[UploadFile] = File(None),
-    text: Optional[str] = Form(None)
+    text: Optional[str] = Form(None),
+    timings: bool = False
 ):
     """
     Detect if uploaded content (image/video) or text is AI-generated.
     
-    Either provide a file OR text content, not both.
+    Either provide a file OR text content, not both. With `?timings=true`
+    the response also says where the request spent its time.
     """
+    started = time.perf_counter()
+    content_type = "unknown"
+    outcome = "error"
+    breakdown = {}
+    shown = breakdown if timings else None
+    
     try:
         # Validate input
         if file and text:
@@ -79,13 +235,6 @@ async def detect_content(
         
         # Handle file upload
         if file:
-            # Validate file size (max 100MB)
-            if file.size and file.size > 100 * 1024 * 1024:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="File size too large. Maximum size is 100MB"
-                )
-            
             # Determine content type
             content_type = get_content_type(file.filename)
             if content_type not in ["image", "video"]:
@@ -94,48 +243,313 @@ async def detect_content(
                     detail="Unsupported file type. Please upload an image or video file"
                 )
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-                content = await file.read()
-                temp_file.write(content)
-                temp_file_path = temp_file.name
+            # Hash in chunks (enforcing the size limit) and stage for detection
+            with stopwatch(breakdown, "upload_ms"):
+                source, digest, _, temp_file_path = await stage_upload(file, content_type)
             
             try:
+                # Identical uploads reuse the stored verdict
+                cache_key = content_key(content_type, digest, fingerprint)
+                with stopwatch(breakdown, "cache_ms"):
+                    cached = result_cache.get(cache_key)
+                if cached is not None:
+                    outcome = "cached"
+                    return timed_response({**cached, "cached": True}, shown, started)
+                
                 # Perform detection
-                result = detector.detect(
-                    content_type=content_type,
-                    content_path=temp_file_path
-                )
-                return JSONResponse(content=result)
+                result = await timed_detection(content_type, breakdown, content_path=source)
+                raise_rejection(result)
+                outcome = "failed" if "error" in result else "ok"
+                cache_result(cache_key, result)
+                return timed_response(result, shown, started)
             
             finally:
                 # Clean up temporary file
-                if os.path.exists(temp_file_path):
+                if temp_file_path and os.path.exists(temp_file_path):
                     os.unlink(temp_file_path)
         
         # Handle text input
         elif text:
+            content_type = "text"
             if not text.strip():
                 raise HTTPException(
                     status_code=400, 
                     detail="Text content cannot be empty"
                 )
             
+            # Identical (normalized) text reuses the stored verdict
+            cache_key = content_key("text", text_digest(text), fingerprint)
+            with stopwatch(breakdown, "cache_ms"):
+                cached = result_cache.get(cache_key)
+            if cached is not None:
+                outcome = "cached"
+                return timed_response({**cached, "cached": True}, shown, started)
+            
             # Perform text detection
-            result = detector.detect(
-                content_type="text",
-                text=text.strip()
+            result = await timed_detection("text", breakdown, text=text.strip())
+            outcome = "failed" if "error" in result else "ok"
+            cache_result(cache_key, result)
+            return timed_response(result, shown, started)
+    
+    except HTTPException as e:
+        outcome = "rejected" if e.status_code in (429, 503) else "invalid"
+        raise
+    except Exception:
+        logger.exception("Unexpected error during detection", extra={"content_type": content_type})
+        raise HTTPException(
+            status_code=500, 
+            detail="Internal server error during detection"
+        )
+    finally:
+        REQUEST_SECONDS.labels(content_type, outcome).observe(time.perf_counter() - started)
+
+async def read_batch_items(request: Request) -> list:
+    """Parse a /detect/batch body into (kind, name, payload) items in input order."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        
+        texts = body.get("texts") if isinstance(body, dict) else body
+        if not isinstance(texts, list):
+            raise HTTPException(
+                status_code=400, 
+                detail='JSON body must be an array of texts or {"texts": [...]}'
             )
-            return JSONResponse(content=result)
+        return [("text", None, text) for text in texts]
+    
+    form = await request.form(max_files=BATCH_MAX_ITEMS, max_fields=BATCH_MAX_ITEMS)
+    items = []
+    for key, value in form.multi_items():
+        if key == "files" and not isinstance(value, str):
+            items.append(("file", value.filename, value))
+        elif key == "texts":
+            items.append(("text", None, value))
+    return items
+
+@app.post("/detect/batch")
+async def detect_batch_content(request: Request):
+    """
+    Detect many files and/or texts in one request.
+    
+    Send multipart form data with repeated `files` and `texts` fields, or a
+    JSON body holding an array of texts (or {"texts": [...]}). Results come
+    back in input order; an item that fails carries its own `error` instead
+    of failing the whole request.
+    """
+    # BodySizeLimitMiddleware has already capped the request at BATCH_MAX_BYTES
+    items = await read_batch_items(request)
+    if not items:
+        raise HTTPException(status_code=400, detail="Please provide at least one file or text")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, 
+            detail=f"Too many items. Maximum is {BATCH_MAX_ITEMS} per batch"
+        )
+    
+    results: List[Optional[dict]] = [None] * len(items)
+    pending = {"image": [], "text": [], "video": []}
+    temp_paths = []
+    
+    try:
+        # Validate items, answer cache hits and stage the rest
+        for index, (kind, name, payload) in enumerate(items):
+            if kind == "text":
+                if not isinstance(payload, str) or not payload.strip():
+                    results[index] = {"type": "text", "error": "Text content cannot be empty"}
+                    continue
+                content_type = "text"
+                cache_key = content_key("text", text_digest(payload), fingerprint)
+            else:
+                content_type = get_content_type(name)
+                if content_type not in ["image", "video"]:
+                    results[index] = {"type": "unknown", "error": "Unsupported file type"}
+                    continue
+                try:
+                    source, digest, _, temp_path = await stage_upload(payload, content_type)
+                except UploadTooLarge:
+                    results[index] = {"type": content_type, "error": "File size too large"}
+                    continue
+                if temp_path:
+                    temp_paths.append(temp_path)
+                cache_key = content_key(content_type, digest, fingerprint)
+            
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                results[index] = {**cached, "cached": True}
+                continue
+            
+            if kind == "text":
+                pending["text"].append((index, cache_key, payload.strip()))
+            else:
+                pending[content_type].append((index, cache_key, source))
+        
+        # Images and texts run in chunks, one batched forward pass per chunk
+        for content_type in ("image", "text"):
+            entries = pending[content_type]
+            for start in range(0, len(entries), BATCH_CHUNK_SIZE):
+                chunk = entries[start:start + BATCH_CHUNK_SIZE]
+                try:
+                    responses = await run_batch_detection(content_type, [payload for _, _, payload in chunk])
+                except HTTPException as e:
+                    responses = [{"type": content_type, "error": e.detail}] * len(chunk)
+                for (index, cache_key, _), response in zip(chunk, responses):
+                    observe_detection(content_type, response)
+                    cache_result(cache_key, response)
+                    results[index] = response
+        
+        # Videos run one job each, subject to the video admission limits
+        async def run_video(index: int, cache_key: str, path: str):
+            try:
+                response = await run_detection("video", content_path=path)
+                observe_detection("video", response)
+                cache_result(cache_key, response)
+            except HTTPException as e:
+                response = {"type": "video", "error": e.detail}
+            results[index] = response
+        
+        await asyncio.gather(*(run_video(*entry) for entry in pending["video"]))
     
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+    except Exception:
+        logger.exception("Unexpected error during batch detection")
         raise HTTPException(
             status_code=500, 
             detail="Internal server error during detection"
         )
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    return JSONResponse(content={
+        "count": len(results),
+        "errors": sum(1 for result in results if "error" in result),
+        "results": [{"index": index, **result} for index, result in enumerate(results)]
+    })
+
+async def run_job(job: Job, content_path: str, cache_key: str):
+    """Run a background job to completion, publishing video frames as they are scored."""
+    loop = asyncio.get_running_loop()
+    on_frame = lambda stats: loop.call_soon_threadsafe(job.add_frame, stats)
+    
+    try:
+        # The job store bounds the backlog, so jobs wait for a slot instead of being rejected
+        async with admitted(job.content_type, reject_when_full=False):
+            job.start()
+            result = await pool.detect(job.content_type, content_path=content_path, on_frame=on_frame)
+        
+        observe_detection(job.content_type, result)
+        if "error" in result:
+            # A failed or rejected detection (e.g. an image over IMAGE_MAX_PIXELS) fails the job
+            job.fail(result["error"])
+        else:
+            cache_result(cache_key, result)
+            job.finish(result)
+    
+    except HTTPException as e:
+        job.fail(e.detail)
+    except Exception:
+        logger.exception("Job failed", extra={"job_id": job.id, "content_type": job.content_type})
+        job.fail("Internal server error during detection")
+    finally:
+        if os.path.exists(content_path):
+            os.unlink(content_path)
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Start analysing an uploaded image or video in the background.
+    
+    Returns a job id straight away. Poll `GET /jobs/{job_id}` for status, or
+    subscribe to `GET /jobs/{job_id}/events` to receive each video frame's
+    statistics as it is scored, followed by the final verdict.
+    """
+    content_type = get_content_type(file.filename)
+    if content_type not in ["image", "video"]:
+        raise HTTPException(
+            status_code=400, 
+            detail="Unsupported file type. Please upload an image or video file"
+        )
+    
+    # The job outlives the request and its upload buffer, so always stage on disk
+    temp_file_path, digest, _ = await asyncio.to_thread(
+        copy_upload, file.file, upload_suffix(file.filename), MAX_FILE_SIZE
+    )
+    
+    try:
+        job = job_store.create(content_type)
+    except JobStoreFullError as e:
+        os.unlink(temp_file_path)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    
+    cache_key = content_key(content_type, digest, fingerprint)
+    cached = result_cache.get(cache_key)
+    
+    if cached is not None:
+        os.unlink(temp_file_path)
+        # Replay the cached frames so event subscribers see the same stream
+        for stats in (cached.get("frame_stats") or {}).get("frame_stats", []):
+            job.add_frame(stats)
+        job.finish({**cached, "cached": True})
+    else:
+        task = asyncio.create_task(run_job(job, temp_file_path, cache_key))
+        job_tasks.add(task)
+        task.add_done_callback(job_tasks.discard)
+    
+    return {
+        **job.to_dict(),
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+def get_job(job_id: str) -> Job:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Current status of a background job, with the final response once it is done."""
+    return get_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a background job.
+    
+    Emits one `frame` event per scored video frame (the event id is the
+    frame's position, so reconnecting with Last-Event-ID resumes after it),
+    then a final `result` or `error` event.
+    """
+    job = get_job(job_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    
+    async def stream():
+        async for index, kind, data in job.events(start):
+            yield f"id: {index}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.on_event("startup")
+async def start_workers():
+    """Start loading the eager models in the background; /ready reports when they are warm."""
+    pool.start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    """Stop the micro-batching tasks and the worker pool."""
+    await image_batcher.close()
+    await text_batcher.close()
+    pool.shutdown()
 
 @app.get("/")
 async def root():
@@ -144,7 +558,14 @@ async def root():
         "message": "Digital Truth Scan API",
         "version": "1.0.0",
         "endpoints": {
-            "POST /detect": "Detect AI-generated content in images, videos, or text"
+            "POST /detect": "Detect AI-generated content in images, videos, or text",
+            "POST /detect/batch": "Detect many files and/or texts in one request",
+            "POST /jobs": "Analyse an image or video in the background",
+            "GET /jobs/{job_id}": "Background job status and result",
+            "GET /jobs/{job_id}/events": "Server-sent frame results and final verdict of a job",
+            "GET /ready": "Readiness: whether the models are loaded and warm",
+            "GET /stats": "Cache, batching and worker queue statistics",
+            "GET /metrics": "Prometheus metrics"
         }
     }
 
@@ -153,6 +574,33 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "Digital Truth Scan API"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the eager models are loaded and warmed up, 503 until then."""
+    readiness = pool.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+@app.get("/stats")
+async def stats():
+    """Cache, micro-batching and admission statistics."""
+    # The near-duplicate index and segment store live in the detector, visible here with thread workers
+    phash_index = pool.detector.phash_index if pool.detector else None
+    segment_store = pool.detector.text_segment_store if pool.detector else None
+    return {
+        "cache": result_cache.stats(),
+        "near_duplicates": phash_index.stats() if phash_index else None,
+        "text_segments": segment_store.stats() if segment_store else None,
+        "batching": {"image": image_batcher.stats(), "text": text_batcher.stats()},
+        "admission": admission.stats(),
+        "jobs": job_store.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and per-stage latency, frames, queue depth, cache hits, model load time."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
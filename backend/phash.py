@@ -0,0 +1,148 @@
+import threading
+from collections import deque
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Supported perceptual hash algorithms (64-bit)
+HASH_ALGORITHMS = ("phash", "dhash")
+
+
+def _to_gray(image) -> np.ndarray:
+    """Grayscale uint8 array from a PIL image or an RGB array."""
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L'))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(image) -> int:
+    """Difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+    small = cv2.resize(_to_gray(image), (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(image) -> int:
+    """DCT hash: low-frequency 8x8 DCT coefficients of a 32x32 thumbnail against their median."""
+    small = cv2.resize(_to_gray(image), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    # The DC term only encodes overall brightness, leave it out of the median
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def image_hash(image, algorithm: str = "phash") -> int:
+    """64-bit perceptual hash of a PIL image or RGB array."""
+    if algorithm == "dhash":
+        return dhash(image)
+    return phash(image)
+
+
+class NearDuplicateIndex:
+    """Hamming-distance index of 64-bit perceptual hashes using multi-index hashing.
+
+    Each hash is split into ``chunks`` 16-bit substrings, each with its own
+    hash table. Two hashes within ``max_distance`` bits must agree to within
+    ``max_distance // chunks`` bits on at least one substring (pigeonhole),
+    so a lookup probes every substring value within that radius and only
+    verifies the handful of candidates it finds. Lookups stay far below a
+    linear scan at millions of entries.
+
+    Each entry stores an arbitrary payload (here, a stored verdict). Once
+    ``max_entries`` is reached the oldest entries are evicted first.
+    """
+
+    def __init__(self, max_distance: int = 4, max_entries: int = 1_000_000, chunks: int = 4):
+        self.max_distance = max(0, max_distance)
+        self.max_entries = max(1, max_entries)
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self.radius = self.max_distance // chunks
+
+        # Bit flip masks to probe around each substring value
+        self._probes = [0] + [
+            sum(1 << bit for bit in flipped)
+            for r in range(1, self.radius + 1)
+            for flipped in combinations(range(self.chunk_bits), r)
+        ]
+
+        # Buckets hold entry ids oldest first, so an evicted entry is always at the front
+        self._tables: List[Dict[int, deque]] = [{} for _ in range(chunks)]
+        self._entries: Dict[int, Tuple[int, Any]] = {}
+        self._order = deque()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _substrings(self, value: int) -> List[int]:
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (i * self.chunk_bits)) & mask for i in range(self.chunks)]
+
+    def add(self, value: int, payload: Any):
+        """Index a hash with its payload."""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (value, payload)
+            self._order.append(entry_id)
+            for table, substring in zip(self._tables, self._substrings(value)):
+                table.setdefault(substring, deque()).append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._evict(self._order.popleft())
+
+    def _evict(self, entry_id: int):
+        value, _ = self._entries.pop(entry_id)
+        for table, substring in zip(self._tables, self._substrings(value)):
+            bucket = table[substring]
+            bucket.popleft()
+            if not bucket:
+                del table[substring]
+
+    def lookup(self, value: int) -> Optional[Tuple[Any, int]]:
+        """Return (payload, distance) of the nearest indexed hash within max_distance, or None."""
+        with self._lock:
+            best = self._nearest(value)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def _nearest(self, value: int) -> Optional[Tuple[Any, int]]:
+        best = None
+        seen = set()
+        for table, substring in zip(self._tables, self._substrings(value)):
+            for probe in self._probes:
+                for entry_id in table.get(substring ^ probe, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    candidate, payload = self._entries[entry_id]
+                    distance = (candidate ^ value).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (payload, distance)
+                        if distance == 0:
+                            # Nothing is nearer than an exact match, stop probing
+                            return best
+        return best
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_distance": self.max_distance,
+        }
@@ -0,0 +1,236 @@
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Queue marker: the stage upstream has finished
+_DONE = object()
+
+# How often blocked workers check whether the pipeline was stopped
+_POLL_SECONDS = 0.05
+
+
+class Stage:
+    """One pipeline step run by ``workers`` threads.
+
+    ``fn`` maps an input to an output, or to None to drop it. With
+    ``batch_size`` it receives a list instead: the first waiting input plus
+    whatever else is already queued, up to ``batch_size`` items (and, with
+    ``max_bytes``, up to that many ``sizeof`` bytes), so batches fill up on
+    their own when this stage is the bottleneck and stay small when it is not.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, batch_size: int = 0,
+                 max_bytes: int = 0, sizeof: Callable[[Any], int] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+
+class _StageState:
+    """Time accounting for one stage, summed over its threads."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.calls = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.lock = threading.Lock()
+        self.remaining = workers
+
+    def add(self, items: int, busy: float, starved: float, blocked: float):
+        with self.lock:
+            self.items += items
+            self.calls += 1
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+    def report(self, elapsed: float) -> dict:
+        capacity = max(elapsed * self.workers, 1e-9)
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "calls": self.calls,
+            "busy_ms": round(self.busy * 1000, 2),
+            # Share of the stage's thread time spent working, waiting for input
+            # and waiting for room downstream; the bottleneck is the busiest stage
+            "utilization": round(min(1.0, self.busy / capacity), 3),
+            "starved": round(min(1.0, self.starved / capacity), 3),
+            "blocked": round(min(1.0, self.blocked / capacity), 3),
+        }
+
+
+class Pipeline:
+    """Producer/consumer stages joined by bounded queues, each stage on its own threads.
+
+    Sources are iterators, each drained by its own thread into the first
+    queue (several sources decode in parallel). Every stage reads from the
+    queue before it and writes to the one after; the caller iterates over
+    the last stage's outputs. Queues hold at most ``queue_size`` items, so a
+    slow stage holds back the ones before it instead of letting decoded
+    data pile up. Outputs arrive in completion order, not input order.
+
+    Threads run in a copy of the caller's context, so telemetry spans opened
+    in stage functions are recorded for the request that runs the pipeline.
+    Leaving the iteration early (or calling stop) stops every stage and
+    closes the sources.
+    """
+
+    def __init__(self, sources: List[Iterable], stages: List[Stage], queue_size: int = 16,
+                 source_name: str = "decode"):
+        self.sources = [iter(source) for source in sources]
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+        self.states = [_StageState(source_name, len(self.sources))] + [
+            _StageState(stage.name, stage.workers) for stage in stages
+        ]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads: List[threading.Thread] = []
+        self._started = None
+        self._finished = None
+
+    def stop(self):
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item) -> float:
+        """Put an item, waiting for room; returns the time spent waiting."""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - start
+
+    def _get(self, q: queue.Queue):
+        """Next item, or _DONE once the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _finish(self, level: int):
+        """A thread at this level is done; the last one tells every worker downstream."""
+        state = self.states[level]
+        with state.lock:
+            state.remaining -= 1
+            last = state.remaining == 0
+        if last:
+            consumers = self.stages[level].workers if level < len(self.stages) else 1
+            for _ in range(consumers):
+                self._put(self.queues[level], _DONE)
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _run_source(self, source: Iterator):
+        state = self.states[0]
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(source)
+                except StopIteration:
+                    break
+                busy = time.perf_counter() - start
+                state.add(1, busy, 0.0, self._put(self.queues[0], item))
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+            self._finish(0)
+
+    def _take_batch(self, stage: Stage, q: queue.Queue, first) -> Tuple[list, bool]:
+        """The first item plus whatever is already queued; also whether _DONE was taken."""
+        batch = [first]
+        size = stage.sizeof(first) if stage.sizeof else 0
+        while len(batch) < stage.batch_size and not (stage.max_bytes and size >= stage.max_bytes):
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+            size += stage.sizeof(item) if stage.sizeof else 0
+        return batch, False
+
+    def _run_stage(self, level: int):
+        stage = self.stages[level - 1]
+        state = self.states[level]
+        q_in, q_out = self.queues[level - 1], self.queues[level]
+        try:
+            done = False
+            while not done and not self._stop.is_set():
+                start = time.perf_counter()
+                item = self._get(q_in)
+                if item is _DONE:
+                    break
+                if stage.batch_size:
+                    item, done = self._take_batch(stage, q_in, item)
+                starved = time.perf_counter() - start
+
+                start = time.perf_counter()
+                output = stage.fn(item)
+                busy = time.perf_counter() - start
+
+                blocked = self._put(q_out, output) if output is not None else 0.0
+                state.add(len(item) if stage.batch_size else 1, busy, starved, blocked)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._finish(level)
+
+    def __iter__(self) -> Iterator:
+        self._started = time.perf_counter()
+        if not self.sources:
+            self.states[0].remaining = 1
+            self._finish(0)
+        for source in self.sources:
+            self._spawn(self._run_source, source)
+        for level in range(1, len(self.stages) + 1):
+            for _ in range(self.stages[level - 1].workers):
+                self._spawn(self._run_stage, level)
+
+        try:
+            while True:
+                item = self._get(self.queues[-1])
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self._finished = time.perf_counter()
+        if self._error is not None:
+            raise self._error
+
+    def _spawn(self, target: Callable, *args):
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(target, *args), daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-stage workers, items, busy time and utilization over the pipeline's run."""
+        if self._started is None:
+            return {}
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        return {state.name: state.report(elapsed) for state in self.states}
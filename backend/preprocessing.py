@@ -0,0 +1,221 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+# PIL resampling filters (as stored in image processor configs) with a torch equivalent
+RESAMPLE_MODES = {2: "bilinear", 3: "bicubic"}
+
+# Reduced decodes keep at least this multiple of the model's input size, so
+# the final antialiased resize still does the filtering
+DECODE_OVERSAMPLE = 2
+
+# Modes Image.reduce averages correctly (palette and bilevel images are converted first)
+_REDUCE_MODES = {"L", "LA", "RGB", "RGBA", "CMYK", "YCbCr", "I", "F"}
+
+
+def _size_value(size, key: str) -> Optional[int]:
+    """One entry of an image processor's size, whether a dict or a SizeDict."""
+    if isinstance(size, dict):
+        return size.get(key)
+    return getattr(size, key, None)
+
+
+def _rgb_array(image: Union[np.ndarray, Image.Image]) -> np.ndarray:
+    """uint8 HWC RGB array for an image or array (grayscale and RGBA converted through PIL)."""
+    if isinstance(image, np.ndarray) and image.dtype == np.uint8 and image.ndim == 3 and image.shape[2] == 3:
+        return image
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    return np.asarray(image.convert("RGB"))
+
+
+class ImageTooLarge(ValueError):
+    """An image would decode to more pixels than the configured budget."""
+
+
+def decode_size(processor) -> Optional[Tuple[int, int]]:
+    """Smallest (height, width) a processor's resize needs from an image, or None if it uses full size."""
+    if not getattr(processor, "do_resize", False):
+        return None
+    size = getattr(processor, "size", None)
+    if isinstance(size, int):
+        return size, size
+    if _size_value(size, "height") and _size_value(size, "width"):
+        return _size_value(size, "height"), _size_value(size, "width")
+    if _size_value(size, "shortest_edge"):
+        edge = _size_value(size, "shortest_edge")
+        return edge, edge
+    return None
+
+
+def _reduce_factor(size: Tuple[int, int], min_size: Tuple[int, int]) -> int:
+    """Largest integer downscale of a (width, height) image keeping both sides above the oversampled minimum."""
+    width, height = size
+    min_height, min_width = min_size
+    return max(1, min(width // (min_width * DECODE_OVERSAMPLE), height // (min_height * DECODE_OVERSAMPLE)))
+
+
+def open_image(source, min_size: Optional[Tuple[int, int]] = None, max_pixels: int = 0) -> Image.Image:
+    """Decode an image (path or binary file object) to RGB, no larger than the model needs.
+
+    With ``min_size`` (height, width), JPEGs decode with DCT scaling (draft
+    mode, 1/2 to 1/8 size) and any remaining integer factor, or the whole
+    factor for other formats, is taken off with a box reduce before the RGB
+    conversion; the image keeps DECODE_OVERSAMPLE times ``min_size``. Images
+    that would decode to more than ``max_pixels`` raise ImageTooLarge before
+    any pixel data is read (Pillow's own MAX_IMAGE_PIXELS check still
+    applies when the header is parsed).
+    """
+    image = Image.open(source)
+    if min_size is not None and image.format == "JPEG":
+        factor = _reduce_factor(image.size, min_size)
+        if factor > 1:
+            # Picks the largest DCT scale not beyond the factor and updates image.size
+            image.draft(image.mode, (image.size[0] // factor, image.size[1] // factor))
+
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f"Image decodes to {width}x{height} pixels, over the {max_pixels} pixel limit")
+
+    factor = _reduce_factor(image.size, min_size) if min_size is not None else 1
+    if factor > 1:
+        if image.mode not in _REDUCE_MODES:
+            image = image.convert("RGB")
+        image = image.reduce(factor)
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    # Read the pixels now: the source may be a buffer closed once the request ends
+    image.load()
+    return image
+
+
+class TensorPreprocessor:
+    """Image processor resize, rescale and normalize as batched tensor ops.
+
+    Takes uint8 RGB arrays (HWC) or PIL images and returns the same
+    ``pixel_values`` as the model's Hugging Face image processor: frames of
+    one shape are stacked and resized in a single interpolate call (on the
+    model's device), then rescaled and normalized with one fused multiply-add.
+    Resizing stays in uint8 on CPU (or is rounded to uint8 levels on GPU), as
+    the processor's PIL resize does, so outputs agree to within
+    resampling-kernel rounding.
+    """
+
+    def __init__(self, resize: Optional[Tuple[str, int, int]], crop: Optional[Tuple[int, int]],
+                 mode: str, scale: float, mean: Sequence[float], std: Sequence[float]):
+        # resize: ("exact", height, width) or ("shortest_edge", edge, 0)
+        self.resize = resize
+        self.crop = crop
+        self.mode = mode
+        # Whether this PyTorch build resizes uint8 tensors in this mode (None until tried)
+        self._uint8_kernel: Optional[bool] = None
+        # (x * scale - mean) / std folded into x * weight + bias, per channel
+        mean = torch.tensor(mean, dtype=torch.float32).view(1, -1, 1, 1)
+        std = torch.tensor(std, dtype=torch.float32).view(1, -1, 1, 1)
+        self.weight = scale / std
+        self.bias = -mean / std
+
+    @classmethod
+    def from_processor(cls, processor) -> Optional["TensorPreprocessor"]:
+        """Mirror an image processor's config, or None if it uses steps not covered here."""
+        size = getattr(processor, "size", None)
+        resize = None
+        if getattr(processor, "do_resize", False):
+            if isinstance(size, int):
+                resize = ("exact", size, size)
+            elif _size_value(size, "height") and _size_value(size, "width"):
+                resize = ("exact", _size_value(size, "height"), _size_value(size, "width"))
+            elif _size_value(size, "shortest_edge") and not _size_value(size, "longest_edge"):
+                resize = ("shortest_edge", _size_value(size, "shortest_edge"), 0)
+            else:
+                return None
+
+        crop = None
+        if getattr(processor, "do_center_crop", False):
+            crop_size = getattr(processor, "crop_size", None)
+            crop = (_size_value(crop_size, "height"), _size_value(crop_size, "width"))
+            if not all(crop):
+                return None
+            if resize is not None and resize[0] == "shortest_edge" and max(crop) > resize[1]:
+                # Cropping past the image would need the processor's padding
+                return None
+
+        mode = RESAMPLE_MODES.get(int(getattr(processor, "resample", 2) or 2))
+        if mode is None or getattr(processor, "do_pad", False) or getattr(processor, "do_reduce_labels", False):
+            return None
+
+        scale = processor.rescale_factor if getattr(processor, "do_rescale", True) else 1.0
+        if getattr(processor, "do_normalize", True):
+            mean, std = processor.image_mean, processor.image_std
+        else:
+            mean, std = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+        return cls(resize, crop, mode, scale, mean, std)
+
+    def _output_size(self, height: int, width: int) -> Tuple[int, int]:
+        if self.resize is None:
+            return height, width
+        if self.resize[0] == "exact":
+            return self.resize[1], self.resize[2]
+        # Shorter side to the edge length, aspect ratio kept (the processor truncates the longer side)
+        edge = self.resize[1]
+        if height <= width:
+            return edge, int(edge * width / height)
+        return int(edge * height / width), edge
+
+    def _interpolate(self, batch: torch.Tensor, size: Tuple[int, int]) -> torch.Tensor:
+        """Antialiased resize of an (N, 3, H, W) uint8 batch to float pixel levels rounded to 0..255."""
+        if batch.device.type == "cpu" and self._uint8_kernel is not False:
+            # PyTorch's uint8 kernel mirrors PIL's fixed-point resampling and skips the float copy
+            try:
+                resized = F.interpolate(batch, size=size, mode=self.mode, align_corners=False, antialias=True)
+                self._uint8_kernel = True
+                return resized.float()
+            except (NotImplementedError, RuntimeError):
+                if self._uint8_kernel:
+                    raise
+                self._uint8_kernel = False
+        resized = F.interpolate(batch.float(), size=size, mode=self.mode, align_corners=False, antialias=True)
+        return resized.round_().clamp_(0, 255)
+
+    def _resize(self, batch: torch.Tensor) -> torch.Tensor:
+        """Resize and crop an (N, 3, H, W) uint8 batch; returns float pixel levels in 0..255."""
+        height, width = batch.shape[-2:]
+        out_height, out_width = self._output_size(height, width)
+        if (out_height, out_width) != (height, width):
+            pixels = self._interpolate(batch, (out_height, out_width))
+        else:
+            pixels = batch.float()
+        if self.crop is not None:
+            crop_height, crop_width = self.crop
+            top = (out_height - crop_height) // 2
+            left = (out_width - crop_width) // 2
+            pixels = pixels[:, :, top:top + crop_height, left:left + crop_width]
+        return pixels
+
+    def __call__(self, images: List[Union[np.ndarray, Image.Image]],
+                 device: Union[str, torch.device] = "cpu") -> Dict[str, torch.Tensor]:
+        """``pixel_values`` for a batch of uint8 RGB arrays or PIL images, built on ``device``."""
+        arrays = [_rgb_array(image) for image in images]
+
+        # Same-shape images (every frame of a video) resize as one stacked batch
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for position, array in enumerate(arrays):
+            groups.setdefault(array.shape, []).append(position)
+
+        outputs: List[Optional[torch.Tensor]] = [None] * len(arrays)
+        weight, bias = self.weight.to(device), self.bias.to(device)
+        for positions in groups.values():
+            # uint8 goes to the device before widening to float: a quarter of the
+            # transfer. The NHWC stack viewed as NCHW is channels-last, the layout
+            # the uint8 resize kernel is fastest in
+            stacked = torch.from_numpy(np.stack([arrays[position] for position in positions]))
+            batch = stacked.to(device).permute(0, 3, 1, 2)
+            pixels = self._resize(batch).mul_(weight).add_(bias)
+            for position, pixel_values in zip(positions, pixels):
+                outputs[position] = pixel_values
+
+        pixel_values = outputs[0].unsqueeze(0) if len(outputs) == 1 else torch.stack(outputs)
+        return {"pixel_values": pixel_values.contiguous()}
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scan: run the detectors over archived media without the HTTP API.
+
+Inputs are directories (walked recursively for images and videos) and
+manifests, one item per line: a file path, or a JSON object with "path" or
+"text" and an optional "id". Items are spread over a pool of worker
+processes, each holding its own AIDetector; images and texts are scored in
+batches (one forward pass per batch), videos one per task. Results are
+appended to a JSONL file as they finish, one record per item:
+
+    python scan.py /archive/media --output results.jsonl
+    python scan.py --manifest items.txt --manifest texts.jsonl --output results.jsonl --workers 8
+
+The output doubles as the checkpoint: rerunning with the same --output
+skips every item already recorded, so an interrupted scan resumes where it
+stopped (Ctrl+C finishes the batches in flight first). Failed detections are
+recorded with "status": "failed" and retried only with --retry-failed.
+
+Detector settings (INFERENCE_BACKEND, VIDEO_SAMPLING, ...) come from the
+same environment variables as the API.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import config_fingerprint, get_content_type
+
+if TYPE_CHECKING:
+    from detectors import AIDetector
+
+# Detector owned by each scan worker process
+_scanner: Optional["AIDetector"] = None
+
+
+def _init_scanner(threads: int):
+    """Load the models once per worker process (Ctrl+C is left to the parent)."""
+    global _scanner
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import torch
+    from detectors import AIDetector
+    from telemetry import configure_logging
+
+    configure_logging()
+    if threads:
+        torch.set_num_threads(threads)
+    _scanner = AIDetector()
+    _scanner.load_models()
+
+
+def _scan_chunk(content_type: str, items: List[dict]) -> List[dict]:
+    """Score one chunk of same-type items in a worker; returns one record per item."""
+    if content_type == "video":
+        responses = [_scanner.detect("video", content_path=item["path"]) for item in items]
+    else:
+        key = "path" if content_type == "image" else "text"
+        responses = _scanner.detect_batch(content_type, [item[key] for item in items])
+
+    records = []
+    for item, response in zip(items, responses):
+        response.pop("timings", None)
+        record = {"id": item["id"], "status": "failed" if "error" in response else "ok"}
+        if "path" in item:
+            record["path"] = item["path"]
+        record.update(response)
+        records.append(record)
+    return records
+
+
+def item_key(item_id: str) -> int:
+    """64-bit digest of an item id: millions of completed ids fit in memory as ints."""
+    return int.from_bytes(hashlib.blake2b(item_id.encode(), digest_size=8).digest(), "big")
+
+
+def iter_directory(root: str) -> Iterator[dict]:
+    """Images and videos under a directory, in a stable (sorted) order."""
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            content_type = get_content_type(filename)
+            if content_type in ("image", "video"):
+                yield {"id": path, "type": content_type, "path": path}
+
+
+def iter_manifest(manifest: str) -> Iterator[dict]:
+    """Items listed in a manifest: plain paths or JSON objects with "path" or "text"."""
+    with open(manifest, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                yield {"id": line, "type": get_content_type(line), "path": line}
+                continue
+
+            entry = json.loads(line)
+            if entry.get("text", "").strip():
+                text = entry["text"].strip()
+                item_id = str(entry.get("id") or "sha256:" + hashlib.sha256(text.encode()).hexdigest())
+                yield {"id": item_id, "type": "text", "text": text}
+            elif entry.get("path"):
+                path = entry["path"]
+                yield {"id": str(entry.get("id") or path), "type": get_content_type(path), "path": path}
+            else:
+                raise ValueError(f"{manifest}:{line_number}: expected a \"path\" or \"text\"")
+
+
+def load_checkpoint(output: str, retry_failed: bool) -> Set[int]:
+    """Keys of the items already recorded in an output file.
+
+    A line cut short by an interrupted write is dropped from the file so
+    appending resumes on a clean line.
+    """
+    done: Set[int] = set()
+    if not os.path.exists(output):
+        return done
+
+    with open(output, "rb+") as f:
+        valid_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            valid_end += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if retry_failed and record.get("status") != "ok":
+                continue
+            done.add(item_key(record["id"]))
+        f.truncate(valid_end)
+    return done
+
+
+def iter_chunks(items: Iterable[dict], done: Set[int], batch_size: int,
+                counts: Dict[str, int]) -> Iterator[Tuple[str, List[dict]]]:
+    """Group pending items into same-type chunks: batch_size images or texts, one video."""
+    buffers: Dict[str, List[dict]] = {"image": [], "text": []}
+    for item in items:
+        if item["type"] not in ("image", "video", "text"):
+            counts["unsupported"] += 1
+            continue
+        key = item_key(item["id"])
+        if key in done:
+            counts["skipped"] += 1
+            continue
+        # Also drops repeats of an item within this run
+        done.add(key)
+        if item["type"] == "video":
+            yield "video", [item]
+            continue
+        buffer = buffers[item["type"]]
+        buffer.append(item)
+        if len(buffer) >= batch_size:
+            yield item["type"], buffer
+            buffers[item["type"]] = []
+    for content_type, buffer in buffers.items():
+        if buffer:
+            yield content_type, buffer
+
+
+class Progress:
+    """Scan counters, with a throughput line on stderr at most every ``interval`` seconds.
+
+    Throughput is measured from the first finished chunk, so model loading
+    in the workers does not drag down items/s.
+    """
+
+    def __init__(self, counts: Dict[str, int], interval: float):
+        self.counts = counts
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.first_result: Optional[float] = None
+        self.first_items = 0
+
+    def add(self, records: List[dict]):
+        for record in records:
+            self.counts["scanned"] += 1
+            if record["status"] != "ok":
+                self.counts["failed"] += 1
+        if self.first_result is None:
+            self.first_result = time.perf_counter()
+            self.first_items = self.counts["scanned"]
+        if time.perf_counter() - self.last_report >= self.interval:
+            self.report()
+
+    def items_per_second(self) -> float:
+        if self.first_result is None or self.last_report <= self.first_result:
+            return 0.0
+        return (self.counts["scanned"] - self.first_items) / (self.last_report - self.first_result)
+
+    def report(self, final: bool = False):
+        self.last_report = time.perf_counter()
+        counts = self.counts
+        startup = (self.first_result or self.last_report) - self.start
+        print(f"{'done' if final else 'progress'}: {counts['scanned']} scanned ({counts['failed']} failed), "
+              f"{counts['skipped']} already done, {counts['unsupported']} unsupported, "
+              f"{self.last_report - self.start:.1f}s ({startup:.1f}s to first result), "
+              f"{self.items_per_second():.2f} items/s",
+              file=sys.stderr, flush=True)
+
+
+def write_records(output, records: List[dict]):
+    for record in records:
+        output.write(json.dumps(record) + "\n")
+    # Each finished chunk reaches the file before the next is awaited: it is the checkpoint
+    output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="directories to scan recursively")
+    parser.add_argument("--manifest", action="append", default=[],
+                        help="file listing paths or JSON items, one per line (repeatable)")
+    parser.add_argument("--output", required=True, help="JSONL results file, also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="worker processes, each loading its own models (default: half the CPUs)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="PyTorch threads per worker (default: CPUs divided among the workers)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_CHUNK_SIZE", "32")),
+                        help="images or texts per forward pass (default: BATCH_CHUNK_SIZE or 32)")
+    parser.add_argument("--retry-failed", action="store_true", help="rescan items recorded as failed")
+    parser.add_argument("--progress-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    if not args.paths and not args.manifest:
+        parser.error("give at least one directory or --manifest")
+    for path in args.paths:
+        if not os.path.isdir(path):
+            parser.error(f"not a directory: {path}")
+
+    def items() -> Iterator[dict]:
+        for path in args.paths:
+            yield from iter_directory(path)
+        for manifest in args.manifest:
+            yield from iter_manifest(manifest)
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    done = load_checkpoint(args.output, args.retry_failed)
+    counts = dict.fromkeys(("scanned", "failed", "skipped", "unsupported"), 0)
+    print(f"Scanning with {args.workers} workers x {threads} threads, batches of {args.batch_size}; "
+          f"{len(done)} items already in {args.output}", file=sys.stderr)
+    print(f"Detector config: {config_fingerprint()}", file=sys.stderr)
+
+    progress = Progress(counts, args.progress_every)
+    # Enough chunks queued to keep every worker busy, without reading the whole input ahead
+    max_pending = args.workers * 2
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"),
+                                   initializer=_init_scanner, initargs=(threads,))
+    pending = set()
+
+    def drain(until: int):
+        nonlocal pending
+        while len(pending) > until:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records = future.result()
+                write_records(output, records)
+                progress.add(records)
+
+    interrupted = False
+    exit_code = 0
+    with open(args.output, "a", encoding="utf-8") as output:
+        try:
+            try:
+                for chunk in iter_chunks(items(), done, args.batch_size, counts):
+                    drain(max_pending - 1)
+                    pending.add(executor.submit(_scan_chunk, *chunk))
+            except KeyboardInterrupt:
+                interrupted = True
+                print(f"Interrupted: finishing {len(pending)} batches in flight (Ctrl+C again to abort)",
+                      file=sys.stderr)
+            drain(0)
+            executor.shutdown()
+        except KeyboardInterrupt:
+            interrupted = True
+            executor.shutdown(wait=False, cancel_futures=True)
+        except BrokenProcessPool:
+            print("A worker process died", file=sys.stderr)
+            exit_code = 1
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    progress.report(final=True)
+    if interrupted or exit_code:
+        print(f"Scan incomplete; rerun with --output {args.output} to resume", file=sys.stderr)
+        sys.exit(exit_code or 130)
+
+if __name__ == "__main__":
+    main()
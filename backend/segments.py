@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+# End of a sentence (punctuation, closing quotes or brackets, whitespace) or of a line
+_UNIT_END = re.compile(r'[.!?…]+["\'”’)\]]*\s+|\n\s*')
+
+# A segment closes after a sentence whose digest is a multiple of this (once
+# it holds min_tokens): cut points depend on the text, not on its offset, so
+# after an edit the segments line up again from the next such sentence
+ANCHOR_EVERY = 8
+
+
+def segment_key(text: str) -> bytes:
+    """Store key of a segment's text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def split_units(text: str) -> List[Tuple[int, int]]:
+    """(start, end) character spans of a text's sentences and lines, trailing whitespace included."""
+    spans = []
+    start = 0
+    for match in _UNIT_END.finditer(text):
+        spans.append((start, match.end()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def plan_segments(text: str, token_starts: Sequence[int], max_tokens: int,
+                  min_tokens: int) -> List[Tuple[int, int, int, int]]:
+    """Content-defined segments of a text: (start_char, end_char, start_token, end_token).
+
+    ``token_starts`` holds the character offset of each token of the whole
+    text. Sentences are packed into segments of at most ``max_tokens``; a
+    segment closes early at an anchor sentence once it holds ``min_tokens``.
+    A sentence longer than ``max_tokens`` is cut into pieces of that size.
+    """
+    units = split_units(text)
+    unit_starts = [start for start, _ in units]
+
+    # Token range of each unit: the tokens that start inside it
+    token_counts = [0] * len(units)
+    for offset in token_starts:
+        token_counts[max(0, bisect_right(unit_starts, offset) - 1)] += 1
+
+    pieces = []
+    token = 0
+    for (start, end), count in zip(units, token_counts):
+        anchor = segment_key(text[start:end].strip())[0] % ANCHOR_EVERY == 0
+        for first in range(token, token + count, max_tokens):
+            last = min(first + max_tokens, token + count)
+            piece_start = start if first == token else token_starts[first]
+            piece_end = end if last == token + count else token_starts[last]
+            pieces.append((piece_start, piece_end, first, last, anchor and last == token + count))
+        token += count
+
+    segments = []
+    current = None
+    for start, end, first, last, anchor in pieces:
+        if current is not None and last - current[2] > max_tokens:
+            segments.append(tuple(current))
+            current = None
+        if current is None:
+            current = [start, end, first, last]
+        else:
+            current[1], current[3] = end, last
+        if anchor and current[3] - current[2] >= min_tokens:
+            segments.append(tuple(current))
+            current = None
+    if current is not None:
+        segments.append(tuple(current))
+    return segments
+
+
+class SegmentStore:
+    """Bounded LRU of text segment scores, keyed by segment_key.
+
+    Holds at most ``max_entries`` scores and evicts the least recently used.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max(1, max_entries)
+        self._scores: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, key: bytes) -> Optional[Tuple[float, float]]:
+        """(real_prob, ai_prob) stored for a segment, or None."""
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def set(self, key: bytes, score: Tuple[float, float]):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._scores),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
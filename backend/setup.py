@@ -8,12 +8,14 @@ setup(
     install_requires=[
         "fastapi==0.104.1",
         "uvicorn[standard]==0.24.0",
+        "gunicorn==21.2.0",
         "python-multipart==0.0.6",
         "transformers==4.35.2",
         "torch==2.1.1",
         "ffmpeg-python==0.2.0",
         "Pillow==10.1.0",
         "opencv-python==4.8.1.78",
+        "prometheus-client==0.19.0",
     ],
     python_requires=">=3.11",
 )
@@ -0,0 +1,243 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Latency buckets (seconds) spanning a cached text lookup to a long video
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_SECONDS = Histogram(
+    "detect_request_seconds", "End-to-end detection request latency",
+    ["content_type", "outcome"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "detect_stage_seconds", "Time spent per item in each detection stage",
+    ["content_type", "stage"], buckets=LATENCY_BUCKETS
+)
+CASCADE_DECISIONS = Counter(
+    "detect_cascade_decisions", "Detections by the cascade stage that decided them",
+    ["content_type", "stage"]
+)
+VIDEO_FRAMES = Counter(
+    "video_frames", "Video frames sampled (decoded) and kept (scored after the quality filter)",
+    ["kind"]
+)
+
+# Set by collect_spans for the detection running in the current thread or task
+_spans: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("spans", default=None)
+_spans_lock = threading.Lock()
+
+
+@contextmanager
+def collect_spans() -> Iterator[Dict[str, float]]:
+    """Collect the durations (seconds, summed per name) of spans opened in this context."""
+    spans: Dict[str, float] = {}
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block under ``name``; a no-op outside collect_spans."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        # Pipeline stages record spans for one request from several threads
+        with _spans_lock:
+            spans[name] = spans.get(name, 0.0) + elapsed
+
+
+def timed_iter(name: str, iterable: Iterable) -> Iterator:
+    """Yield from an iterable, timing each step (e.g. decoding the next video frame) under ``name``."""
+    iterator = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def stopwatch(into: dict, key: str):
+    """Store a block's duration in milliseconds as ``into[key]``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        into[key] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def stage_timings(spans: Dict[str, float], total_seconds: float, items: int = 1) -> dict:
+    """Timing entry for a detection response: stage times are split evenly across a batch's items."""
+    items = max(1, items)
+    return {
+        "detector_ms": round(total_seconds * 1000, 2),
+        "batch_size": items,
+        "stages_ms": {name: round(seconds / items * 1000, 3) for name, seconds in spans.items()},
+    }
+
+
+def observe_detection(content_type: str, response: dict) -> Optional[dict]:
+    """Record a detector response's stage timings, deciding stage and frame counts; returns the timings, removed from it."""
+    timings = response.pop("timings", None)
+    if timings:
+        for stage, ms in timings["stages_ms"].items():
+            STAGE_SECONDS.labels(content_type, stage).observe(ms / 1000)
+    if response.get("decided_by"):
+        CASCADE_DECISIONS.labels(content_type, response["decided_by"]).inc()
+
+    frame_stats = response.get("frame_stats")
+    if content_type == "video" and isinstance(frame_stats, dict):
+        VIDEO_FRAMES.labels("sampled").inc(frame_stats.get("frames_evaluated", 0))
+        VIDEO_FRAMES.labels("kept").inc(frame_stats.get("n_frames", 0))
+    return timings
+
+
+class ServiceCollector:
+    """Scrape-time gauges and counters read from the service's own bookkeeping.
+
+    Queue depths and admission rejections come from the AdmissionController,
+    micro-batch backlogs from the MicroBatchers, cache hits and misses from
+    the ResultCache, and model state and load time from the DetectionPool.
+    """
+
+    def __init__(self, pool, admission, batchers: dict, cache, job_store):
+        self.pool = pool
+        self.admission = admission
+        self.batchers = batchers
+        self.cache = cache
+        self.job_store = job_store
+
+    def collect(self):
+        queue_depth = GaugeMetricFamily(
+            "detect_queue_depth", "Detection jobs waiting for or holding a worker slot", labels=["content_type", "state"]
+        )
+        rejected = CounterMetricFamily(
+            "detect_rejected", "Requests rejected with 429 because the queue was full", labels=["content_type"]
+        )
+        for content_type, lane in self.admission.stats().items():
+            queue_depth.add_metric([content_type, "queued"], lane["queued"])
+            queue_depth.add_metric([content_type, "in_flight"], lane["in_flight"])
+            rejected.add_metric([content_type], lane["rejected"])
+        yield queue_depth
+        yield rejected
+
+        batch_depth = GaugeMetricFamily(
+            "microbatch_queue_depth", "Items waiting to join a micro-batch", labels=["content_type"]
+        )
+        for content_type, batcher in self.batchers.items():
+            batch_depth.add_metric([content_type], batcher.stats()["queued"])
+        yield batch_depth
+
+        cache = self.cache.stats()
+        lookups = CounterMetricFamily("detect_cache_lookups", "Result cache lookups", labels=["result"])
+        lookups.add_metric(["hit"], cache["hits"])
+        lookups.add_metric(["miss"], cache["misses"])
+        yield lookups
+        yield GaugeMetricFamily("detect_cache_entries", "Results held in the in-memory cache", value=cache["entries"])
+
+        yield GaugeMetricFamily("jobs_active", "Background jobs queued or running", value=self.job_store.active())
+
+        readiness = self.pool.readiness()
+        load_seconds = GaugeMetricFamily("model_load_seconds", "Time taken to load each model", labels=["modality"])
+        loaded = GaugeMetricFamily("model_loaded", "Whether each model is loaded", labels=["modality"])
+        for modality, model in (readiness.get("models") or {}).items():
+            if model.get("load_seconds") is not None:
+                load_seconds.add_metric([modality], model["load_seconds"])
+            loaded.add_metric([modality], 1 if model.get("state") in ("loaded", "ready") else 0)
+        yield load_seconds
+        yield loaded
+        yield GaugeMetricFamily("service_ready", "1 once the eager models are loaded and warm",
+                                value=1 if readiness.get("ready") else 0)
+
+
+# The collector registered by the API process, also used for multiprocess scrapes
+_service_collector: Optional[ServiceCollector] = None
+
+
+def register_service_collector(collector: ServiceCollector):
+    global _service_collector
+    if _service_collector is not None:
+        # The app module was imported again (e.g. by a reloader); replace the old collector
+        REGISTRY.unregister(_service_collector)
+    _service_collector = collector
+    REGISTRY.register(collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition of all metrics, and its content type.
+
+    Under gunicorn with PROMETHEUS_MULTIPROC_DIR set, histograms and
+    counters are merged across worker processes; the scrape-time values
+    come from whichever worker answers.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if _service_collector is not None:
+        registry.register(_service_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any ``extra`` fields."""
+
+    _reserved = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in self._reserved})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging():
+    """Log to stderr as text or JSON lines (LOG_FORMAT), at LOG_LEVEL (DEBUG with DETECTOR_DEBUG=true).
+
+    Safe to call more than once, e.g. in the API process and again in each
+    worker process.
+    """
+    root = logging.getLogger()
+    if any(getattr(handler, "_detector_handler", False) for handler in root.handlers):
+        return
+
+    debug = os.getenv("DETECTOR_DEBUG", "false").lower() == "true"
+    level = os.getenv("LOG_LEVEL", "DEBUG" if debug else "INFO").upper()
+
+    handler = logging.StreamHandler()
+    handler._detector_handler = True
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Uploads are hashed and copied in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    """Raised once more than the allowed number of bytes has been read."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"File size too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+        )
+
+
+def _chunks(fileobj: BinaryIO, max_bytes: int):
+    """Read a file object from the start in chunks, raising UploadTooLarge past max_bytes."""
+    fileobj.seek(0)
+    size = 0
+    while True:
+        chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        yield chunk
+
+
+def digest_upload(fileobj: BinaryIO, max_bytes: int) -> Tuple[str, int]:
+    """SHA-256 hex digest and size of an upload, leaving it rewound for decoding in place."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in _chunks(fileobj, max_bytes):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def spooled_path(fileobj: BinaryIO) -> Optional[str]:
+    """A path the upload's own spool file can be opened by, or None.
+
+    Starlette spools uploads to an anonymous temporary file (fileno() rolls
+    a small in-memory one over to disk). On Linux that file stays reachable
+    through /proc while the request holds it open, so ffmpeg and worker
+    processes can read it there instead of from a second copy.
+    """
+    try:
+        fd = fileobj.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    path = f"/proc/{os.getpid()}/fd/{fd}"
+    return path if os.path.exists(path) else None
+
+
+def copy_upload(fileobj: BinaryIO, suffix: str, max_bytes: int) -> Tuple[str, str, int]:
+    """Stream an upload into a temporary file, hashing it on the way.
+
+    Returns (path, digest, size); the caller removes the file. Nothing is
+    left behind if the upload turns out to be too large.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        try:
+            for chunk in _chunks(fileobj, max_bytes):
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            temp_file.close()
+            os.unlink(temp_file.name)
+            raise
+    return temp_file.name, digest.hexdigest(), size
+
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies over a per-path byte limit while they stream in.
+
+    A Content-Length over the limit is refused before anything is read;
+    otherwise bytes are counted as the body arrives and the request fails
+    with 413 as soon as the count passes the limit, so an oversized upload
+    is never spooled in full.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send, limit: int):
+        body = ('{"detail": "Request body too large. Maximum size is %dMB"}' % (limit // (1024 * 1024))).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
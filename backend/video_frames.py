@@ -0,0 +1,353 @@
+import logging
+import os
+import tempfile
+from typing import Dict, Iterator, List, Tuple
+
+import cv2
+import ffmpeg
+import numpy as np
+
+from config import MAX_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Supported frame decoding modes
+DECODE_MODES = ("auto", "stream", "seek")
+
+# In "auto" mode, stream while each sampled frame costs at most this many
+# decoded source frames. Beyond that (long clips sampled sparsely), seeking
+# straight to each timestamp decodes less than a full pass does.
+STREAM_MAX_FRAMES_PER_SAMPLE = 150
+
+# Frame sampling: "uniform" (1 fps, capped at max_frames) or "adaptive"
+# (score a denser grid of low-resolution candidates, keep the sharpest
+# visually distinct ones)
+SAMPLING_MODES = ("uniform", "adaptive")
+
+# Adaptive sampling: candidate grid density and the size candidates are scored at
+CANDIDATE_FPS = 2.0
+CANDIDATES_PER_FRAME = 4
+CANDIDATE_WIDTH = 160
+
+
+def probe_video(video_path: str) -> Dict:
+    """Return duration, frame rate and decoded frame size of the first video stream."""
+    probe = ffmpeg.probe(video_path)
+    streams = probe.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), streams[0])
+
+    duration = video.get('duration') or probe.get('format', {}).get('duration')
+    num, _, den = video.get('avg_frame_rate', video.get('r_frame_rate', '0/1')).partition('/')
+    fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+    width = int(video.get('width', 0))
+    height = int(video.get('height', 0))
+
+    # ffmpeg auto-rotates on decode, so portrait phone videos come out transposed
+    rotation = int(float(video.get('tags', {}).get('rotate', 0)))
+    for side_data in video.get('side_data_list', []):
+        if 'rotation' in side_data:
+            rotation = int(float(side_data['rotation']))
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+
+    return {"duration": float(duration), "fps": fps, "width": width, "height": height}
+
+
+def sample_times(duration: float, max_frames: int = MAX_FRAMES) -> np.ndarray:
+    """Timestamps to sample: 1 fps, spread out so there are at most max_frames."""
+    frame_interval = max(1.0, duration / max_frames)
+    return np.arange(0, duration, frame_interval)
+
+
+def iter_frames_seek(video_path: str, frame_times: np.ndarray) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (index, timestamp, rgb frame) by running one ffmpeg seek per frame.
+
+    Every frame is written to a temporary JPEG and read back with OpenCV.
+    Kept for comparison with the streaming decoder and as a fallback for
+    containers that do not decode cleanly in a single pass.
+    """
+    frames_dir = tempfile.mkdtemp()
+    try:
+        for i, time in enumerate(frame_times):
+            frame_path = os.path.join(frames_dir, f"frame_{i:04d}.jpg")
+
+            # Extract frame at specific time with high quality
+            try:
+                (
+                    ffmpeg
+                    .input(video_path, ss=time)
+                    .output(frame_path, vframes=1, pix_fmt='rgb24', **{'q:v': 1})
+                    .overwrite_output()
+                    .run(capture_stderr=True)
+                )
+            except ffmpeg.Error as e:
+                logger.warning("Error extracting frame at %ss: %s", time, e.stderr.decode(errors="replace") if e.stderr else e)
+                continue
+
+            # cv2.imread always returns BGR, convert back to RGB
+            frame = cv2.imread(frame_path, cv2.IMREAD_COLOR)
+            os.remove(frame_path)
+            if frame is None:
+                continue
+
+            yield i, time, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        for name in os.listdir(frames_dir):
+            os.remove(os.path.join(frames_dir, name))
+        os.rmdir(frames_dir)
+
+
+def iter_frames_stream(video_path: str, frame_times: np.ndarray, width: int, height: int) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (index, timestamp, rgb frame) from a single ffmpeg process.
+
+    The video is opened once, resampled with the fps filter so that output
+    frame i is the last source frame at or before frame_times[i], and piped
+    to us as raw rgb24 - no temp files and no JPEG round-trip.
+    """
+    if len(frame_times) == 0:
+        return
+
+    frame_interval = frame_times[1] - frame_times[0] if len(frame_times) > 1 else 1.0
+    frame_size = width * height * 3
+
+    process = (
+        ffmpeg
+        .input(video_path)
+        .filter('fps', fps=1.0 / frame_interval, round='up')
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', vframes=len(frame_times))
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdout=True)
+    )
+
+    try:
+        for i, time in enumerate(frame_times):
+            buffer = process.stdout.read(frame_size)
+            if len(buffer) < frame_size:
+                break
+            yield i, time, np.frombuffer(buffer, np.uint8).reshape(height, width, 3)
+    finally:
+        # Kill before closing the pipe so an early stop is not logged as a broken pipe
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def iter_frames_selected(video_path: str, grid_times: np.ndarray, indices: List[int],
+                         width: int, height: int) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (grid index, timestamp, rgb frame) for selected points of a uniform time grid.
+
+    One ffmpeg pass: the fps filter lays out the same grid the candidates
+    were decoded on, and the select filter passes only the chosen grid
+    frames on to be converted and piped at full resolution.
+    """
+    if not indices:
+        return
+
+    frame_interval = grid_times[1] - grid_times[0] if len(grid_times) > 1 else 1.0
+    frame_size = width * height * 3
+    expression = "+".join(f"eq(n,{index})" for index in indices)
+
+    process = (
+        ffmpeg
+        .input(video_path)
+        .filter('fps', fps=1.0 / frame_interval, round='up')
+        .filter('select', expression)
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', vframes=len(indices), vsync='passthrough')
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdout=True)
+    )
+
+    try:
+        for index in indices:
+            buffer = process.stdout.read(frame_size)
+            if len(buffer) < frame_size:
+                break
+            yield index, grid_times[index], np.frombuffer(buffer, np.uint8).reshape(height, width, 3)
+    finally:
+        # Kill before closing the pipe so an early stop is not logged as a broken pipe
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def decode_candidates(video_path: str, grid_times: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Decode a time grid as small grayscale frames, stacked into one (n, h, w) uint8 array."""
+    small_width = min(CANDIDATE_WIDTH, width)
+    small_height = max(2, int(round(height * small_width / width / 2)) * 2)
+    frame_interval = grid_times[1] - grid_times[0] if len(grid_times) > 1 else 1.0
+
+    # Scoring tolerates deblocking artefacts, and skipping the loop filter
+    # takes about a quarter off H.264 decode time
+    out, _ = (
+        ffmpeg
+        .input(video_path, skip_loop_filter='all')
+        .filter('fps', fps=1.0 / frame_interval, round='up')
+        .filter('scale', small_width, small_height)
+        .output('pipe:', format='rawvideo', pix_fmt='gray', vframes=len(grid_times))
+        .global_args('-loglevel', 'error')
+        .run(capture_stdout=True)
+    )
+    count = len(out) // (small_width * small_height)
+    return np.frombuffer(out[:count * small_width * small_height], np.uint8).reshape(count, small_height, small_width)
+
+
+def sharpness_scores(frames: np.ndarray) -> np.ndarray:
+    """Laplacian variance of every frame in an (n, h, w) stack at once."""
+    f = frames.astype(np.float32)
+    laplacian = (f[:, 1:-1, :-2] + f[:, 1:-1, 2:] + f[:, :-2, 1:-1] + f[:, 2:, 1:-1]
+                 - 4 * f[:, 1:-1, 1:-1])
+    return laplacian.reshape(len(frames), -1).var(axis=1)
+
+
+def thumbnail_distances(frames: np.ndarray, size: int = 16) -> np.ndarray:
+    """Pairwise RMS gray-level difference between size x size thumbnails of every frame."""
+    n, height, width = frames.shape
+    # Average-pool to size x size (cropping any remainder)
+    rows, cols = height // size, width // size
+    pooled = frames[:, :rows * size, :cols * size].astype(np.float32)
+    pooled = pooled.reshape(n, size, rows, size, cols).mean(axis=(2, 4)).reshape(n, -1)
+
+    squared = (pooled ** 2).sum(axis=1)
+    distances = squared[:, None] + squared[None, :] - 2 * pooled @ pooled.T
+    return np.sqrt(np.maximum(distances, 0) / pooled.shape[1])
+
+
+def select_keyframes(frames: np.ndarray, max_frames: int, min_frames: int, min_distance: float) -> List[int]:
+    """Pick up to max_frames sharp, mutually distinct candidates; returns indices in time order.
+
+    Candidates are taken sharpest first and kept only if they differ from
+    every frame already kept by at least min_distance (RMS gray levels on
+    16x16 thumbnails). If fewer than min_frames survive (a static shot),
+    the sharpest remaining candidates fill up to min_frames.
+    """
+    order = np.argsort(-sharpness_scores(frames), kind="stable")
+    distances = thumbnail_distances(frames)
+
+    selected = []
+    for index in order:
+        if len(selected) >= max_frames:
+            break
+        if not selected or distances[index, selected].min() >= min_distance:
+            selected.append(int(index))
+
+    for index in order:
+        if len(selected) >= min(min_frames, max_frames):
+            break
+        if index not in selected:
+            selected.append(int(index))
+
+    return sorted(selected)
+
+
+def choose_decode_mode(info: Dict, frame_times: np.ndarray) -> str:
+    """Pick the cheaper decoder for a clip, given its probe info and sample times."""
+    if len(frame_times) < 2 or not info["fps"]:
+        return "stream"
+    frames_per_sample = (frame_times[1] - frame_times[0]) * info["fps"]
+    return "stream" if frames_per_sample <= STREAM_MAX_FRAMES_PER_SAMPLE else "seek"
+
+
+def plan_frames(video_path: str, sampling: str = "uniform", mode: str = "auto", max_frames: int = MAX_FRAMES,
+                min_frames: int = 8, min_distance: float = 6.0) -> Tuple[Dict, np.ndarray, List[int], Dict]:
+    """Decide which frames to decode, without decoding any at full size.
+
+    Returns (probe info, time grid, grid indices to decode, sampling
+    statistics). Uniform sampling keeps every point of the 1 fps grid.
+    Adaptive sampling decodes a grid of up to CANDIDATES_PER_FRAME *
+    max_frames candidates (at most CANDIDATE_FPS) as small grayscale
+    frames, scores sharpness and distinctness across the whole stack at
+    once and keeps the chosen indices. Clips that the decoder would sample
+    by seeking (long and sparse) fall back to uniform sampling, since a
+    full low-resolution pass would cost more than it saves.
+    """
+    if mode not in DECODE_MODES:
+        raise ValueError(f"Unsupported video decode mode: {mode}")
+
+    info = probe_video(video_path)
+    frame_times = sample_times(info["duration"], max_frames)
+    if sampling != "adaptive":
+        return info, frame_times, list(range(len(frame_times))), {"sampling": "uniform"}
+
+    grid_times = np.arange(0, info["duration"], max(1.0 / CANDIDATE_FPS, info["duration"] / (max_frames * CANDIDATES_PER_FRAME)))
+    # Never score more frames than uniform sampling would
+    budget = min(max_frames, len(frame_times))
+
+    if mode == "seek" or (mode == "auto" and choose_decode_mode(info, grid_times) == "seek") or len(grid_times) <= min_frames:
+        return info, frame_times, list(range(len(frame_times))), {"sampling": "uniform"}
+
+    candidates = decode_candidates(video_path, grid_times, info["width"], info["height"])
+    selected = select_keyframes(candidates, budget, min_frames, min_distance)
+    stats = {"sampling": "adaptive", "candidates": len(candidates), "selected": len(selected)}
+    return info, grid_times[:len(candidates)], selected, stats
+
+
+def coverage_order(indices: List[int]) -> List[int]:
+    """Reorder indices so that every prefix is spread evenly over the clip.
+
+    Positions are visited in bit-reversed order (0, n/2, n/4, 3n/4, ...),
+    so the first few frames already span the whole video.
+    """
+    bits = max(1, (len(indices) - 1).bit_length())
+    positions = sorted(range(len(indices)), key=lambda position: int(format(position, f"0{bits}b")[::-1], 2))
+    return [indices[position] for position in positions]
+
+
+def iter_planned(video_path: str, info: Dict, grid_times: np.ndarray, indices: List[int],
+                 mode: str = "auto", coverage: bool = False) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (grid index, timestamp, rgb frame) for the planned grid points.
+
+    Frames come in time order. With ``coverage``, frames decoded by
+    seeking come in coverage_order instead, which costs nothing extra;
+    a streaming pass always runs front to back.
+    """
+    if mode == "auto":
+        mode = choose_decode_mode(info, grid_times)
+
+    if mode == "seek":
+        order = coverage_order(indices) if coverage else indices
+        for position, time, frame in iter_frames_seek(video_path, grid_times[order]):
+            yield order[position], time, frame
+    elif len(indices) == len(grid_times):
+        yield from iter_frames_stream(video_path, grid_times, info["width"], info["height"])
+    else:
+        yield from iter_frames_selected(video_path, grid_times, indices, info["width"], info["height"])
+
+
+def split_planned(video_path: str, info: Dict, grid_times: np.ndarray, indices: List[int], mode: str = "auto",
+                  coverage: bool = False, parts: int = 1) -> List[Iterator[Tuple[int, float, np.ndarray]]]:
+    """iter_planned split into up to ``parts`` iterators that can decode in parallel.
+
+    Only seeking splits: each part takes every ``parts``-th planned frame
+    (interleaved, so together they still cover the clip early) with its own
+    ffmpeg processes. A streaming pass is one sequential read and stays whole.
+    """
+    if mode == "auto":
+        mode = choose_decode_mode(info, grid_times)
+    if mode != "seek" or parts <= 1 or len(indices) <= 1:
+        return [iter_planned(video_path, info, grid_times, indices, mode, coverage)]
+
+    order = coverage_order(indices) if coverage else list(indices)
+
+    def part(share: List[int]) -> Iterator[Tuple[int, float, np.ndarray]]:
+        for position, time, frame in iter_frames_seek(video_path, grid_times[share]):
+            yield share[position], time, frame
+
+    return [part(order[offset::parts]) for offset in range(min(parts, len(order)))]
+
+
+def iter_frames(video_path: str, mode: str = "auto", max_frames: int = MAX_FRAMES) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Sample frames from a video using the requested decoding mode."""
+    if mode not in DECODE_MODES:
+        raise ValueError(f"Unsupported video decode mode: {mode}")
+
+    info = probe_video(video_path)
+    frame_times = sample_times(info["duration"], max_frames)
+
+    if mode == "auto":
+        mode = choose_decode_mode(info, frame_times)
+
+    if mode == "seek":
+        return iter_frames_seek(video_path, frame_times)
+    return iter_frames_stream(video_path, frame_times, info["width"], info["height"])
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from config import backend_from_env
+from telemetry import configure_logging
+
+if TYPE_CHECKING:
+    # detectors pulls in torch, transformers and cv2; it is imported on first use
+    from detectors import AIDetector
+
+logger = logging.getLogger(__name__)
+
+# Supported worker pool kinds
+POOL_KINDS = ("thread", "process")
+
+
+class QueueFullError(Exception):
+    """Raised when a content type already has the maximum number of jobs waiting."""
+
+
+class PoolUnavailableError(Exception):
+    """Raised when the worker pool is shut down or one of its processes died."""
+
+
+class _Lane:
+    """In-flight and waiting job bookkeeping for one content type."""
+
+    def __init__(self, max_in_flight: int, max_queued: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max(0, max_queued)
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+
+class AdmissionController:
+    """Cap concurrently running and queued jobs per content type.
+
+    A job runs straight away while fewer than ``max_in_flight`` jobs of its
+    type are running, waits while fewer than ``max_queued`` are already
+    waiting, and is rejected with QueueFullError otherwise. Rejecting early
+    keeps a burst of uploads from piling up behind slow video analysis.
+    """
+
+    def __init__(self, limits: Dict[str, tuple]):
+        self.lanes = {
+            content_type: _Lane(max_in_flight, max_queued)
+            for content_type, (max_in_flight, max_queued) in limits.items()
+        }
+
+    @asynccontextmanager
+    async def admit(self, content_type: str, reject_when_full: bool = True):
+        """Hold a running slot for one job.
+
+        Callers that bound their own backlog (e.g. the job store) pass
+        ``reject_when_full=False`` to wait for a slot regardless of
+        ``max_queued``.
+        """
+        lane = self.lanes[content_type]
+
+        if reject_when_full and lane.in_flight >= lane.max_in_flight and lane.waiting >= lane.max_queued:
+            lane.rejected += 1
+            raise QueueFullError(f"Too many {content_type} jobs queued")
+
+        lane.waiting += 1
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+
+        lane.in_flight += 1
+        try:
+            yield
+        finally:
+            lane.in_flight -= 1
+            lane.semaphore.release()
+
+    def stats(self) -> dict:
+        """Current load and rejection counts per content type."""
+        return {
+            content_type: {
+                "in_flight": lane.in_flight,
+                "queued": lane.waiting,
+                "max_in_flight": lane.max_in_flight,
+                "max_queued": lane.max_queued,
+                "rejected": lane.rejected,
+            }
+            for content_type, lane in self.lanes.items()
+        }
+
+
+# Detector owned by each worker process when running a process pool
+_worker_detector: Optional["AIDetector"] = None
+
+
+def _init_worker_process():
+    global _worker_detector
+    configure_logging()
+    from detectors import AIDetector
+    _worker_detector = AIDetector()
+    _worker_detector.load_models()
+
+
+def _process_readiness() -> dict:
+    return _worker_detector.readiness()
+
+
+def _process_detect(content_type: str, content_path: str = None, text: str = None, progress=None) -> dict:
+    on_frame = progress.put if progress is not None else None
+    return _worker_detector.detect(content_type, content_path=content_path, text=text, on_frame=on_frame)
+
+
+def _relay_progress(progress, on_frame: Callable[[dict], None]):
+    # Forward frame statistics from a worker process until the None sentinel
+    for stats in iter(progress.get, None):
+        on_frame(stats)
+
+
+def _process_detect_batch(content_type: str, items: List[str]) -> List[dict]:
+    return _worker_detector.detect_batch(content_type, items)
+
+
+class DetectionPool:
+    """Runs detection off the event loop on a thread or process pool.
+
+    Thread workers share the API process's detector; torch releases the GIL
+    during inference, so threads overlap model compute with request
+    handling. Process workers each load their own AIDetector and isolate
+    crashes, at the cost of one model copy per process.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, detector: "AIDetector" = None):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"WORKER_POOL must be one of {POOL_KINDS}")
+
+        self.kind = kind
+        self.workers = max(1, workers)
+        self._manager = None
+
+        # Thread workers share one detector, created on first use or by
+        # start(); process workers each build their own when they spawn
+        self.detector: Optional["AIDetector"] = detector
+        self._detector_lock = threading.Lock()
+        self._worker_readiness: Optional[dict] = None
+        self.startup_error: Optional[str] = None
+
+        if kind == "process":
+            self.executor: Executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker_process
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="detect")
+
+    def get_detector(self) -> "AIDetector":
+        """The shared detector of a thread pool, importing and creating it on first use."""
+        if self.detector is None:
+            with self._detector_lock:
+                if self.detector is None:
+                    from detectors import AIDetector
+                    self.detector = AIDetector()
+        return self.detector
+
+    def preload(self):
+        """Load the eager models now, before the server forks its workers.
+
+        Forked workers then share the weights copy-on-write instead of each
+        loading a copy; inference never writes to them, so the pages stay
+        shared. Warm-up is left to each worker, and ONNX Runtime sessions
+        (whose thread pools do not survive fork) still load after fork.
+        """
+        if self.kind == "process":
+            logger.info("Model preloading only applies to thread worker pools; skipping")
+            return
+
+        detector = self.get_detector()
+        modalities = [
+            modality for modality, mode in detector.model_loading.items()
+            if mode == "eager" and backend_from_env(modality) != "onnx"
+        ]
+        detector.load_models(modalities, defer_warm_up=True)
+
+    def start(self):
+        """Load the eager models in the background so the API answers straight away.
+
+        Thread pools build the shared detector and load its eager models
+        concurrently; process pools spawn a worker, whose initializer loads
+        them, and record its readiness once it answers.
+        """
+        if self.kind == "process":
+            future = self.executor.submit(_process_readiness)
+            future.add_done_callback(self._record_process_readiness)
+        else:
+            threading.Thread(target=self._load_models, name="model-loader", daemon=True).start()
+
+    def _load_models(self):
+        try:
+            self.get_detector().load_models()
+        except Exception as e:
+            self.startup_error = str(e)
+            logger.exception("Model loading failed")
+
+    def _record_process_readiness(self, future):
+        try:
+            self._worker_readiness = future.result()
+        except Exception as e:
+            self.startup_error = str(e)
+            logger.exception("Worker startup failed")
+
+    def readiness(self) -> dict:
+        """Whether the eager models are loaded (and warmed up), with per-model state."""
+        if self.kind == "process":
+            info = self._worker_readiness or {"ready": False, "models": None}
+        elif self.detector is None:
+            info = {"ready": False, "models": None}
+        else:
+            info = self.detector.readiness()
+        if self.startup_error:
+            info = {**info, "ready": False, "error": self.startup_error}
+        return info
+
+    def batch_fn(self, content_type: str) -> Callable[[List[str]], List[dict]]:
+        """Batch function for MicroBatcher that runs inside this pool's workers."""
+        if self.kind == "process":
+            return partial(_process_detect_batch, content_type)
+        return partial(self._thread_detect_batch, content_type)
+
+    def _thread_detect_batch(self, content_type: str, items: List[str]) -> List[dict]:
+        return self.get_detector().detect_batch(content_type, items)
+
+    async def detect(self, content_type: str, content_path: str = None, text: str = None,
+                     on_frame: Callable[[dict], None] = None) -> dict:
+        """Run AIDetector.detect on a worker.
+
+        ``on_frame`` receives each video frame's statistics as it is scored.
+        It is called from a worker-side thread, not the event loop.
+        """
+        if self.kind == "process":
+            if on_frame is not None:
+                return await self._detect_with_progress(content_type, content_path, text, on_frame)
+            fn = partial(_process_detect, content_type, content_path, text)
+        else:
+            fn = partial(self._thread_detect, content_type, content_path, text, on_frame)
+        return await self.run(fn)
+
+    def _thread_detect(self, content_type: str, content_path: str, text: str,
+                       on_frame: Callable[[dict], None]) -> dict:
+        return self.get_detector().detect(content_type, content_path=content_path, text=text, on_frame=on_frame)
+
+    async def _detect_with_progress(self, content_type: str, content_path: str, text: str,
+                                    on_frame: Callable[[dict], None]) -> dict:
+        # Worker processes report frames through a manager queue; a relay
+        # thread hands them to on_frame in this process
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        progress = self._manager.Queue()
+        relay = threading.Thread(target=_relay_progress, args=(progress, on_frame), daemon=True)
+        relay.start()
+        try:
+            return await self.run(partial(_process_detect, content_type, content_path, text, progress))
+        finally:
+            # Every frame was queued before the worker returned, so the
+            # relay has delivered them all once it reaches the sentinel
+            progress.put(None)
+            await asyncio.to_thread(relay.join)
+
+    async def run(self, fn: Callable):
+        """Run a callable on the pool, translating a dead pool into PoolUnavailableError."""
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self.executor, fn)
+        except RuntimeError as e:
+            # "cannot schedule new futures after shutdown"
+            raise PoolUnavailableError(str(e)) from e
+
+        try:
+            return await future
+        except BrokenProcessPool as e:
+            raise PoolUnavailableError(str(e)) from e
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+
+def limits_from_env() -> Dict[str, tuple]:
+    """Per content type (max_in_flight, max_queued) limits.
+
+    Video runs one job per worker thread for its whole duration, so its
+    in-flight cap defaults below the pool size to leave workers free for
+    image and text batches.
+    """
+    defaults = {"image": (16, 64), "text": (32, 128), "video": (2, 4)}
+    return {
+        content_type: (
+            int(os.getenv(f"{content_type.upper()}_MAX_IN_FLIGHT", str(max_in_flight))),
+            int(os.getenv(f"{content_type.upper()}_MAX_QUEUED", str(max_queued))),
+        )
+        for content_type, (max_in_flight, max_queued) in defaults.items()
+    }